@@ -0,0 +1,89 @@
+"""Per-question cost of the educhat gate on 10k questions.
+
+Run from the backend directory:
+
+    python benchmarks/bench_edu_gate.py --questions 10000
+
+Compares the old per-keyword substring loop with the compiled alternation
+in services.edu_gate, checks both give the same decisions, and (with
+--classifier) times the optional scikit-learn classifier path.
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.edu_gate import EDU_KEYWORDS, EduGate
+
+FILLER = (
+    "please can you explain how why what when the a of to in is for on with this that my our "
+    "teacher asked me about yesterday friend game movie weekend food travel phone music sports"
+).split()
+EXPLICIT_SAMPLES = ("NSFW", "sexual", "18+", "oral", "cum laude", "analysis", "sextant")
+
+# The pre-compiled-gate explicit filter, kept here as the baseline.
+LEGACY_EXPLICIT = re.compile(
+    r"\b(18\+|16\+|nsfw|porn|sex|sexual|nude|naked|erotic|fetish|bdsm|incest|rape|bestiality|onlyfans|boobs|penis|vagina|semen|cum|anal|oral|blowjob|handjob|hookup|escort)\b",
+    re.IGNORECASE
+)
+
+
+def legacy_is_educational(q: str) -> bool:
+    t = q.lower()
+    if LEGACY_EXPLICIT.search(t):
+        return False
+    hits = sum(1 for w in EDU_KEYWORDS if w in t)
+    return hits >= 1
+
+
+def make_question(rng: random.Random, words: int) -> str:
+    tokens = [rng.choice(FILLER) for _ in range(words)]
+    if rng.random() < 0.6:
+        tokens.insert(rng.randrange(len(tokens) + 1), rng.choice(sorted(EDU_KEYWORDS)))
+    if rng.random() < 0.05:
+        tokens.insert(rng.randrange(len(tokens) + 1), rng.choice(EXPLICIT_SAMPLES))
+    return " ".join(tokens).capitalize() + "?"
+
+
+def time_per_question(fn, questions):
+    t0 = time.perf_counter()
+    decisions = [fn(q) for q in questions]
+    return 1e6 * (time.perf_counter() - t0) / len(questions), decisions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=10000)
+    parser.add_argument("--lengths", default="10,50,300")
+    parser.add_argument("--classifier", default="")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    gate = EduGate()
+    clf_gate = None
+    if args.classifier:
+        clf_gate = EduGate()
+        clf_gate.load(args.classifier)
+
+    header = f"{'words':>5} {'loop us':>9} {'regex us':>9} {'speedup':>8}"
+    print(header + (f" {'clf us':>9}" if clf_gate else ""))
+    for words in (int(n) for n in args.lengths.split(",")):
+        questions = [make_question(rng, words) for _ in range(args.questions)]
+        loop_us, expected = time_per_question(legacy_is_educational, questions)
+        regex_us, got = time_per_question(gate.is_educational, questions)
+        if got != expected:
+            mismatches = sum(a != b for a, b in zip(got, expected))
+            raise SystemExit(f"compiled gate disagrees with the loop on {mismatches} questions")
+        line = f"{words:>5} {loop_us:>9.2f} {regex_us:>9.2f} {loop_us / regex_us:>7.1f}x"
+        if clf_gate:
+            clf_us, _ = time_per_question(clf_gate.is_educational, questions)
+            line += f" {clf_us:>9.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Throughput and tail latency of the essay scorer for batch sizes 1-64.
+
+Run from the backend directory:
+
+    python benchmarks/bench_essay_scorer.py --requests 2000
+
+For each batch size, N concurrent requests go through EssayScorer with
+max_batch set to that size. The report gives essays/s and per-request
+p50/p99 latency, plus the raw model.predict time for one batch.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from joblib import load
+from services.essay_scorer import EssayScorer
+
+WORDS = (
+    "education school student teacher learning knowledge important because however therefore "
+    "society technology environment future opinion believe example reason conclusion argument "
+    "people children family community history science experience problem solution world"
+).split()
+
+
+def make_essay(rng: random.Random, words: int) -> str:
+    sentences = []
+    while words > 0:
+        n = min(words, rng.randint(8, 20))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + ".")
+        words -= n
+    return " ".join(sentences)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_scorer(model, essays, batch_size, window_ms):
+    scorer = EssayScorer(model, window_ms=window_ms, max_batch=batch_size)
+    latencies = []
+
+    async def one(essay):
+        t0 = time.perf_counter()
+        await scorer.score(essay)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(e) for e in essays))
+    elapsed = time.perf_counter() - t0
+    return len(essays) / elapsed, latencies, scorer.metrics()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="models/essay_grader.joblib")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--sizes", default="1,2,4,8,16,32,64")
+    args = parser.parse_args()
+
+    model = load(args.model)
+    rng = random.Random(0)
+    essays = [make_essay(rng, args.words) for _ in range(args.requests)]
+    model.predict(essays[:2])  # warm up
+
+    print(f"{'batch':>5} {'essays/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'avg batch':>9} {'predict ms':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        throughput, latencies, stats = asyncio.run(run_scorer(model, essays, size, args.window_ms))
+        timings = []
+        for i in range(0, min(len(essays), size * 20), size):
+            t0 = time.perf_counter()
+            model.predict(essays[i:i + size])
+            timings.append(time.perf_counter() - t0)
+        print(
+            f"{size:>5} {throughput:>10.1f} {1000 * percentile(latencies, 0.5):>9.2f} "
+            f"{1000 * percentile(latencies, 0.99):>9.2f} {stats['avg_batch']:>9} "
+            f"{1000 * statistics.median(timings):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Serial vs page-range parallel PDF extraction for 10, 100 and 1000 pages.
+
+Run from the backend directory:
+
+    python benchmarks/bench_pdf_extract.py --workers 4
+
+Generates text-only PDFs with PyMuPDF in a temp directory, then times the
+serial extract_text_from_pdf_path against PdfExtractor (thread path below
+--min-pages, process pool above) and checks both give the same text.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from services.doc_extract import PdfExtractor, extract_text_from_pdf_path
+
+WORDS = (
+    "photosynthesis energy cell membrane equation force motion velocity acceleration democracy "
+    "constitution river climate grammar sentence paragraph algorithm variable function history"
+).split()
+
+
+def make_pdf(path: str, pages: int, rng: random.Random) -> None:
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        text = f"Page {i + 1}\n" + "\n".join(" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(45))
+        page.insert_textbox(fitz.Rect(36, 36, page.rect.width - 36, page.rect.height - 36), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def best_of(repeat, fn):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings), statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", default="10,100,1000")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--range-pages", type=int, default=32)
+    parser.add_argument("--min-pages", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    extractor = PdfExtractor(workers=args.workers, parallel_min_pages=args.min_pages, range_pages=args.range_pages)
+    extractor.start()
+    loop = asyncio.new_event_loop()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"{'pages':>6} {'serial ms':>10} {'engine ms':>10} {'speedup':>8} {'pages/s':>9}")
+            for pages in (int(n) for n in args.pages.split(",")):
+                path = os.path.join(tmp, f"doc_{pages}.pdf")
+                make_pdf(path, pages, rng)
+                loop.run_until_complete(extractor.extract_text(path))  # warm up the pool
+                serial, _, expected = best_of(args.repeat, lambda: extract_text_from_pdf_path(path))
+                engine, _, got = best_of(args.repeat, lambda: loop.run_until_complete(extractor.extract_text(path)))
+                if got != expected:
+                    raise SystemExit(f"engine output differs from serial extraction at {pages} pages")
+                print(f"{pages:>6} {1000 * serial:>10.1f} {1000 * engine:>10.1f} {serial / engine:>7.2f}x {pages / engine:>9.0f}")
+    finally:
+        extractor.shutdown()
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
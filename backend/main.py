@@ -1,18 +1,38 @@
 import os
+import asyncio
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from pymongo import MongoClient
 
 from routes.auth import router as auth_router
 from routes.doubt import router as doubt_router
 from routes.essay import router as essay_router
 from routes.notes import router as notes_router
 from routes.study import router as study_router
-from routes.ytchat import router as ytchat_router
+from routes.ytchat import router as ytchat_router, load_flights as ytchat_load_flights
 from routes.aitutor import router as aitutor_router
 from routes.educhat import router as edu_router
+from services.activity_log import activity_log
+from services.auth_service import ensure_indexes, migrate_student_links, migrate_users, auth_cache_metrics, token_revocations, password_hasher
+from services.password_hasher import PASSWORD_HASH_CALIBRATE
+from services.db import get_db, close_client, pool_metrics
+from services.llm_client import llm_metrics
+from services.study_plan_service import plan_store
+from services.extract_cache import extract_cache
+from services.ocr import ocr_engine
+from services.doc_extract import pdf_extractor
+from services.uploads import UploadLimitMiddleware
+from services.yt_index_store import yt_index_store
+from services.chain_cache import yt_chain_cache
+from services.embedding_cache import text_embeddings
+from services.essay_service import essay_scorer
+from services.sse import sse_metrics
+from services.conversation_store import conversation_store
+from services.semantic_cache import educhat_answer_cache
+from services.edu_gate import edu_gate
+from services.study_classifier import study_classifier
+from services.notes_service import load_encoding as load_notes_encoding
 
 load_dotenv()
 
@@ -21,8 +41,6 @@ API_DESC = "All models & Functions under 1 API"
 API_VERSION = "3.7.5"
 API_PREFIX = os.getenv("API_PREFIX", "").rstrip("/")
 
-MONGO_URI = os.getenv("MONGODB_URI")
-DB_NAME   = os.getenv("DB_NAME")
 STORAGE_ROOT = Path(os.getenv("STORAGE_ROOT", "storage")).resolve()
 
 def _cors_origins() -> list[str]:
@@ -31,23 +49,54 @@ def _cors_origins() -> list[str]:
 
 app = FastAPI(title=API_TITLE, version=API_VERSION, description=API_DESC)
 
+# Starlette runs the last-added middleware outermost; CORS must wrap the
+# upload limit so its 413 responses carry CORS headers.
+app.add_middleware(UploadLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_cors_origins(),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 @app.on_event("startup")
-def _startup():
-    client = MongoClient(MONGO_URI, connect=True)
-    app.state.db = client[DB_NAME]
+async def _startup():
+    app.state.db = get_db()
     app.state.logs_col = app.state.db["activity_logs"]
+    await migrate_student_links()
+    await migrate_users()
+    await ensure_indexes()
+    token_revocations.start()
+    if PASSWORD_HASH_CALIBRATE:
+        await asyncio.to_thread(password_hasher.calibrate)
+    password_hasher.start()
+    activity_log.start(app.state.logs_col)
+    plan_store.start(app.state.db["study_plans"])
+    conversation_store.start(app.state.db["tutor_conversations"])
+    study_classifier.start(app.state.db["study_classifier_labels"])
 
     (STORAGE_ROOT / "images").mkdir(parents=True, exist_ok=True)
     (STORAGE_ROOT / "pdfs").mkdir(parents=True, exist_ok=True)
     app.state.storage_root = STORAGE_ROOT
+    await asyncio.to_thread(extract_cache.open, STORAGE_ROOT / "extract_cache")
+    ocr_engine.start()
+    yt_index_store.open(STORAGE_ROOT / "ytchat")
+    await asyncio.to_thread(text_embeddings.open, STORAGE_ROOT / "embeddings")
+    await asyncio.to_thread(edu_gate.load)
+    await asyncio.to_thread(study_classifier.load)
+    await asyncio.to_thread(load_notes_encoding)
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await plan_store.stop()
+    await token_revocations.stop()
+    ocr_engine.shutdown()
+    pdf_extractor.shutdown()
+    password_hasher.shutdown()
+    await activity_log.stop()
+    close_client()
 
 app.include_router(auth_router,  prefix=f"{API_PREFIX}/auth",  tags=["Auth"])
 app.include_router(doubt_router, prefix=f"{API_PREFIX}/doubt", tags=["Doubt Solver"])
@@ -74,10 +123,34 @@ def root():
             "ytchat": f"{API_PREFIX}/ytchat/ask",
             "aitutor":f"{API_PREFIX}/aitutor/ask",
             "educhat":f"{API_PREFIX}/educhat/chat",
-            "health": f"{API_PREFIX}/healthz"
+            "health": f"{API_PREFIX}/healthz",
+            "metrics": f"{API_PREFIX}/metrics"
         },
     }
 
 @app.get(f"{API_PREFIX}/healthz")
 def healthz():
     return {"status": "healthy"}
+
+@app.get(f"{API_PREFIX}/metrics")
+def metrics():
+    return {
+        "activity_log": activity_log.metrics(),
+        "mongo_pool": pool_metrics.snapshot(),
+        "llm": llm_metrics(),
+        "study_plans": plan_store.metrics(),
+        "extract_cache": extract_cache.metrics(),
+        "ocr": ocr_engine.metrics(),
+        "pdf_extract": pdf_extractor.metrics(),
+        "ytchat_cache": yt_chain_cache.metrics(),
+        "ytchat_loads": ytchat_load_flights.metrics(),
+        "embedding_cache": text_embeddings.metrics(),
+        "essay_scorer": essay_scorer.metrics(),
+        "auth_cache": auth_cache_metrics(),
+        "password_hasher": password_hasher.metrics(),
+        "streaming": sse_metrics(),
+        "tutor_conversations": conversation_store.metrics(),
+        "educhat_cache": educhat_answer_cache.metrics(),
+        "educhat_gate": edu_gate.metrics(),
+        "ytchat_classifier": study_classifier.metrics(),
+    }
@@ -1,3 +1,4 @@
+from typing import List
 from pydantic import BaseModel, Field
 
 class EssayRequest(BaseModel):
@@ -14,3 +15,6 @@ class EssayResponse(BaseModel):
     essay: str
     predicted_score: float
     explanation: str
+
+class EssayBatchRequest(BaseModel):
+    essays: List[EssayRequest]
@@ -4,11 +4,14 @@ from typing import Optional
 from pathlib import Path
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from pymongo import MongoClient
 from services.auth_service import decode_token, get_user_by_username
-from langchain_core.prompts import ChatPromptTemplate
+from services.activity_log import log_activity
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import StrOutputParser
+from services.llm_client import ainvoke, astream
+from services.sse import wants_stream, sse_response
+from services.conversation_store import conversation_store
 
 router = APIRouter()
 
@@ -47,25 +50,14 @@ async def _user_from_bearer(request: Request) -> tuple[Optional[str], Optional[s
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
     user_id = payload.get("userId") or payload.get("user_id") or payload.get("userid")
     username = payload.get("sub") or payload.get("username") or payload.get("email")
-    full_name = None
-    if username:
+    full_name = payload.get("full_name")
+    if full_name is None and username:
+        # Tokens issued before full_name became a claim.
         user_doc = await get_user_by_username(username)
         if user_doc:
             full_name = user_doc.get("full_name") or user_doc.get("name")
     return user_id, full_name, username
 
-def _get_db_and_logs(request: Request):
-    db = getattr(request.app.state, "db", None)
-    logs = getattr(request.app.state, "logs_col", None)
-    if db is not None and logs is not None:
-        return db, logs
-    uri = os.getenv("MONGODB_URI") or os.getenv("MONGO_URI", "mongodb://127.0.0.1:27017")
-    dbname = os.getenv("DB_NAME", "brainbuddy")
-    client = MongoClient(uri, connect=True)
-    request.app.state.db = client[dbname]
-    request.app.state.logs_col = request.app.state.db["activity_logs"]
-    return request.app.state.db, request.app.state.logs_col
-
 def _ensure_storage(request: Request) -> Path:
     root = getattr(request.app.state, "storage_root", None)
     if root is not None:
@@ -98,6 +90,7 @@ Rules:
 - For math/science, show formulas where helpful (LaTeX allowed).
 - Keep the explanation focused and avoid extra fluff.
 """),
+    MessagesPlaceholder("history"),
     ("human", """Subject: {subject}
 Question: {question}
 
@@ -114,23 +107,38 @@ Respond using this structure:
 """)
 ])
 chain = TUTOR_PROMPT | llm | parser
-CHAT_HISTORY: dict[str, list[dict[str, str]]] = {}
 
 @router.post("/ask")
 async def ask_tutor(request: Request, payload: TutorRequest, conversation_id: str = "default"):
-    user_id, name, _ = await _user_from_bearer(request)
-    db, logs = _get_db_and_logs(request)
+    user_id, name, username = await _user_from_bearer(request)
     _ensure_storage(request)
-    if conversation_id not in CHAT_HISTORY:
-        CHAT_HISTORY[conversation_id] = []
-    CHAT_HISTORY[conversation_id].append({"role": "human", "message": payload.question})
-    resp = chain.invoke({"subject": payload.subject, "question": payload.question})
-    CHAT_HISTORY[conversation_id].append({"role": "ai", "message": resp})
-    logs.insert_one({
-        "user_id": user_id,
-        "name": name,
-        "data": {"type": "tutor", "subject": payload.subject, "question": payload.question, "conversation_id": conversation_id},
-        "output": {"response": resp},
-        "datetime": datetime.now(timezone.utc).isoformat(),
-    })
-    return {"response": resp, "chat_history": CHAT_HISTORY[conversation_id]}
+    user = user_id or username or "anonymous"
+    history = await conversation_store.get(user, conversation_id)
+    inputs = {
+        "subject": payload.subject,
+        "question": payload.question,
+        "history": conversation_store.context(history),
+    }
+
+    async def record(resp: str):
+        chat_history = await conversation_store.append(
+            user,
+            conversation_id,
+            {"role": "human", "message": payload.question},
+            {"role": "ai", "message": resp},
+        )
+        await log_activity({
+            "user_id": user_id,
+            "name": name,
+            "data": {"type": "tutor", "subject": payload.subject, "question": payload.question, "conversation_id": conversation_id},
+            "output": {"response": resp},
+            "datetime": datetime.now(timezone.utc).isoformat(),
+        })
+        return chat_history
+
+    if wants_stream(request):
+        async def finish(resp: str):
+            return {"chat_history": await record(resp)}
+        return sse_response("aitutor", astream(chain, inputs, provider="openai"), finish)
+    resp = await ainvoke(chain, inputs, provider="openai")
+    return {"response": resp, "chat_history": await record(resp)}
@@ -1,6 +1,10 @@
-from typing import List, Dict, Any
+import json
+from datetime import datetime
+from typing import List, Dict, Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
 from services.auth_service import (
@@ -11,9 +15,12 @@ from services.auth_service import (
     TokenOut,
     create_user,
     authenticate_user,
-    create_access_token,
+    issue_access_token_for_user,
     decode_token,
     list_users,
+    iter_users,
+    USER_LIST_PAGE_SIZE,
+    USER_LIST_MAX_PAGE_SIZE,
     update_me,
     admin_update_user,
     get_user_by_username,
@@ -93,7 +100,13 @@ async def login(form: OAuth2PasswordRequestForm = Depends()):
     user = await authenticate_user(form.username, form.password)
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
-    token = create_access_token(data={"sub": user["username"], "userId": user["userId"]})
+    token = await issue_access_token_for_user(user)
+    return {"access_token": token, "token_type": "bearer"}
+
+@router.post("/token/refresh", response_model=TokenOut)
+async def refresh_token(current: Dict[str, Any] = Depends(get_current_user)):
+    # Re-issue with current claims (name, roles, class) after profile changes.
+    token = await issue_access_token_for_user(current)
     return {"access_token": token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserPublic)
@@ -109,9 +122,30 @@ async def me_update(payload: UserUpdateSelf, current: Dict[str, Any] = Depends(g
     return updated
 
 @router.get("/users", response_model=List[UserPublic])
-async def users_list(current: Dict[str, Any] = Depends(get_current_user)):
+async def users_list(
+    response: Response,
+    limit: int = Query(USER_LIST_PAGE_SIZE, ge=1, le=USER_LIST_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    role: Optional[str] = None,
+    active: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    current: Dict[str, Any] = Depends(get_current_user),
+):
     ensure_admin(current)
-    docs = await list_users()
+    if format == "ndjson":
+        # Export: every matching user, streamed one JSON object per line.
+        async def gen():
+            async for doc in iter_users(role, active, created_from, created_to):
+                yield json.dumps(jsonable_encoder(doc)) + "\n"
+        return StreamingResponse(gen(), media_type="application/x-ndjson")
+    try:
+        docs, next_cursor = await list_users(limit, after, role, active, created_from, created_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return docs
 
 @router.put("/users/{user_id}", response_model=UserPublic)
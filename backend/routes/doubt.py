@@ -1,13 +1,15 @@
 from datetime import datetime, timezone
-import uuid, io, os
+import uuid, os
 from pathlib import Path
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 from fastapi.responses import JSONResponse
-from pymongo import MongoClient
-from PIL import Image
-import pytesseract
-from services.doubt_service import get_answer_from_text
+from services.doubt_service import get_answer_from_text, stream_answer
 from services.auth_service import decode_token, get_user_by_username
+from services.activity_log import log_activity
+from services.extract_cache import extract_cache
+from services.ocr import ocr_engine
+from services.uploads import save_upload, MAX_IMAGE_UPLOAD_BYTES
+from services.sse import wants_stream, sse_response
 
 router = APIRouter()
 
@@ -42,24 +44,14 @@ async def _user_from_bearer(request: Request) -> tuple[str | None, str | None]:
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
     user_id = payload.get("userId")
     username = payload.get("sub")
-    full_name = None
-    if username:
+    full_name = payload.get("full_name")
+    if full_name is None and username:
+        # Tokens issued before full_name became a claim.
         user_doc = await get_user_by_username(username)
         if user_doc:
             full_name = user_doc.get("full_name") or user_doc.get("name")
     return user_id, full_name
 
-def _get_logs_col(request: Request):
-    logs = getattr(request.app.state, "logs_col", None)
-    if logs is not None:
-        return logs
-    uri = os.getenv("MONGODB_URI") or os.getenv("MONGO_URI", "mongodb://127.0.0.1:27017")
-    dbname = os.getenv("DB_NAME", "brainbuddy")
-    client = MongoClient(uri, connect=True)
-    request.app.state.db = client[dbname]
-    request.app.state.logs_col = request.app.state.db["activity_logs"]
-    return request.app.state.logs_col
-
 def _get_storage_root(request: Request) -> Path:
     root = getattr(request.app.state, "storage_root", None)
     if root:
@@ -78,18 +70,26 @@ async def solve(request: Request, image: UploadFile = File(...)):
     ext = ("." + image.filename.split(".")[-1].lower()) if "." in image.filename else ""
     new_name = f"{uuid.uuid4().hex}{ext}"
     final_path = images_dir / new_name
-    raw = await image.read()
-    with open(final_path, "wb") as f:
-        f.write(raw)
-    try:
-        text = pytesseract.image_to_string(Image.open(io.BytesIO(raw))).strip()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"OCR error: {e}")
+    _, digest = await save_upload(image, final_path, MAX_IMAGE_UPLOAD_BYTES)
+    text = await extract_cache.get("ocr", digest)
+    if text is None:
+        text = await ocr_engine.extract_text(str(final_path))
+        await extract_cache.put("ocr", digest, text)
     if not text:
         raise HTTPException(status_code=400, detail="No text found in image.")
-    answer = get_answer_from_text(text)
-    logs = _get_logs_col(request)
-    logs.insert_one({
+    if wants_stream(request):
+        async def finish(answer: str):
+            await log_activity({
+                "user_id": user_id,
+                "name": name,
+                "data": {"type": "image", "filename": new_name, "path": str(final_path)},
+                "output": {"extracted_text": text, "answer": answer},
+                "datetime": datetime.now(timezone.utc).isoformat(),
+            })
+            return {"extracted_text": text, "file": {"filename": new_name, "path": str(final_path)}}
+        return sse_response("doubt", stream_answer(text), finish)
+    answer = await get_answer_from_text(text)
+    await log_activity({
         "user_id": user_id,
         "name": name,
         "data": {"type": "image", "filename": new_name, "path": str(final_path)},
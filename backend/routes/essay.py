@@ -1,14 +1,17 @@
 from datetime import datetime, timezone
-import os
+import os, json
 from fastapi import APIRouter, HTTPException, Request
-from pymongo import MongoClient
+from fastapi.responses import StreamingResponse
 from pathlib import Path
-from models.essay_models import EssayRequest, EssayResponse
-from services.essay_service import predict_score_and_explain
+from models.essay_models import EssayRequest, EssayResponse, EssayBatchRequest
+from services.essay_service import predict_score_and_explain, predict_scores, explain_many
 from services.auth_service import decode_token, get_user_by_username
+from services.activity_log import log_activity, log_activity_many
 
 router = APIRouter()
 
+ESSAY_ANALYZE_BATCH_MAX = int(os.getenv("ESSAY_ANALYZE_BATCH_MAX", "300"))
+
 def _extract_token(request: Request) -> str:
     qtok = request.query_params.get("access_token")
     if qtok:
@@ -40,24 +43,14 @@ async def _user_from_bearer(request: Request) -> tuple[str | None, str | None]:
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
     user_id = payload.get("userId")
     username = payload.get("sub")
-    full_name = None
-    if username:
+    full_name = payload.get("full_name")
+    if full_name is None and username:
+        # Tokens issued before full_name became a claim.
         user_doc = await get_user_by_username(username)
         if user_doc:
             full_name = user_doc.get("full_name") or user_doc.get("name")
     return user_id, full_name
 
-def _get_logs_col(request: Request):
-    logs = getattr(request.app.state, "logs_col", None)
-    if logs is not None:
-        return logs
-    uri = os.getenv("MONGODB_URI")
-    dbname = os.getenv("DB_NAME", "brainbuddy")
-    client = MongoClient(uri, connect=True)
-    request.app.state.db = client[dbname]
-    request.app.state.logs_col = request.app.state.db["activity_logs"]
-    return request.app.state.logs_col
-
 def _get_storage_root(request: Request) -> Path:
     root = getattr(request.app.state, "storage_root", None)
     if root is not None:
@@ -74,10 +67,9 @@ async def analyze_essay(request: Request, payload: EssayRequest):
     if not essay:
         raise HTTPException(status_code=400, detail="Essay text is required.")
     user_id, name = await _user_from_bearer(request)
-    result = predict_score_and_explain(essay)
-    logs = _get_logs_col(request)
+    result = await predict_score_and_explain(essay)
     _get_storage_root(request)
-    logs.insert_one({
+    await log_activity({
         "user_id": user_id,
         "name": name,
         "data": {"type": "essay", "text": essay},
@@ -88,3 +80,39 @@ async def analyze_essay(request: Request, payload: EssayRequest):
         "datetime": datetime.now(timezone.utc).isoformat(),
     })
     return result
+
+@router.post("/analyze-batch")
+async def analyze_essay_batch(request: Request, payload: EssayBatchRequest):
+    essays = [(item.essay or "").strip() for item in payload.essays]
+    if not essays:
+        raise HTTPException(status_code=400, detail="At least one essay is required.")
+    if len(essays) > ESSAY_ANALYZE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {ESSAY_ANALYZE_BATCH_MAX} essays per batch.")
+    empty = [i for i, e in enumerate(essays) if not e]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"Essay text is required (missing at index {empty[0]}).")
+    user_id, name = await _user_from_bearer(request)
+    scores = await predict_scores(essays)
+    _get_storage_root(request)
+
+    async def gen():
+        docs = []
+        try:
+            async for item in explain_many(essays, scores):
+                src = payload.essays[item["index"]]
+                if "explanation" in item:
+                    docs.append({
+                        "user_id": user_id,
+                        "name": name,
+                        "data": {"type": "essay", "text": essays[item["index"]], "batch_index": item["index"],
+                                 "student_id": src.user_id, "student_name": src.name},
+                        "output": {
+                            "predicted_score": item["predicted_score"],
+                            "explanation": item["explanation"],
+                        },
+                        "datetime": datetime.now(timezone.utc).isoformat(),
+                    })
+                yield json.dumps({**item, "userId": src.user_id, "name": src.name}) + "\n"
+        finally:
+            await log_activity_many(docs)
+    return StreamingResponse(gen(), media_type="application/x-ndjson")
@@ -1,11 +1,15 @@
 from datetime import datetime, timezone
-import uuid
+import uuid, asyncio
 from pathlib import Path
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 from fastapi.responses import JSONResponse
-from services.doc_extract import extract_text_from_pdf_bytes, extract_text_from_docx_bytes
-from services.notes_service import summarize_text
+from services.doc_extract import extract_text_from_docx_path, pdf_extractor
+from services.notes_service import summarize_text, stream_summary
+from services.extract_cache import extract_cache
+from services.uploads import save_upload, MAX_DOC_UPLOAD_BYTES
 from services.auth_service import decode_token, get_user_by_username
+from services.activity_log import log_activity
+from services.sse import wants_stream, sse_response
 
 router = APIRouter()
 
@@ -40,37 +44,52 @@ async def _user_from_bearer(request: Request) -> tuple[str | None, str | None]:
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
     user_id = payload.get("userId")
     username = payload.get("sub")
-    full_name = None
-    if username:
+    full_name = payload.get("full_name")
+    if full_name is None and username:
+        # Tokens issued before full_name became a claim.
         user_doc = await get_user_by_username(username)
         if user_doc:
             full_name = user_doc.get("full_name") or user_doc.get("name")
     return user_id, full_name
 
+async def _extract_docx(path: str) -> str:
+    return await asyncio.to_thread(extract_text_from_docx_path, path)
+
 @router.post("/summarize")
 async def summarize(request: Request, file: UploadFile = File(...)):
     user_id, name = await _user_from_bearer(request)
-    raw = await file.read()
-    storage_root: Path = request.app.state.storage_root
-    pdfs_dir = storage_root / "pdfs"
-    ext = ("." + file.filename.split(".")[-1].lower()) if "." in file.filename else ""
-    new_name = f"{uuid.uuid4().hex}{ext}"
-    final_path = pdfs_dir / new_name
-    with open(final_path, "wb") as f:
-        f.write(raw)
     lower = file.filename.lower()
     if lower.endswith(".pdf"):
-        text = extract_text_from_pdf_bytes(raw)
-        dtype = "pdf"
+        extract, dtype = pdf_extractor.extract_text, "pdf"
     elif lower.endswith(".docx"):
-        text = extract_text_from_docx_bytes(raw)
-        dtype = "docx"
+        extract, dtype = _extract_docx, "docx"
     else:
         raise HTTPException(status_code=400, detail="Only .pdf or .docx files are supported.")
+    storage_root: Path = request.app.state.storage_root
+    pdfs_dir = storage_root / "pdfs"
+    ext = ("." + file.filename.split(".")[-1].lower()) if "." in file.filename else ""
+    new_name = f"{uuid.uuid4().hex}{ext}"
+    final_path = pdfs_dir / new_name
+    _, digest = await save_upload(file, final_path, MAX_DOC_UPLOAD_BYTES)
+    text = await extract_cache.get(dtype, digest)
+    if text is None:
+        text = await extract(str(final_path))
+        await extract_cache.put(dtype, digest, text)
     if not text or len(text) < 20:
         raise HTTPException(status_code=400, detail="Extracted text is too short or empty.")
-    summary = summarize_text(text)
-    request.app.state.logs_col.insert_one({
+    if wants_stream(request):
+        async def finish(summary: str):
+            await log_activity({
+                "user_id": user_id,
+                "name": name,
+                "data": {"type": dtype, "filename": new_name, "path": str(final_path)},
+                "output": {"summary": summary},
+                "datetime": datetime.now(timezone.utc).isoformat(),
+            })
+            return {"filename": file.filename, "file": {"filename": new_name, "path": str(final_path)}}
+        return sse_response("notes", stream_summary(text), finish)
+    summary = await summarize_text(text)
+    await log_activity({
         "user_id": user_id,
         "name": name,
         "data": {"type": dtype, "filename": new_name, "path": str(final_path)},
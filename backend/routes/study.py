@@ -3,10 +3,11 @@ import os
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from pymongo import MongoClient
 from pathlib import Path
-from services.auth_service import decode_token, get_user_by_username
-from services.llm_client import flash_25
+from services.auth_service import decode_token, get_user_by_username, get_class_std
+from services.activity_log import log_activity
+from services.study_plan_service import PLAN_SUBJECTS, plan_store
+from services.sse import wants_stream, sse_response
 
 router = APIRouter()
 
@@ -44,8 +45,9 @@ async def _user_from_bearer(request: Request) -> tuple[Optional[str], Optional[s
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
     user_id = payload.get("userId") or payload.get("user_id") or payload.get("userid")
     username = payload.get("sub") or payload.get("username") or payload.get("email")
-    full_name = None
-    if username:
+    full_name = payload.get("full_name")
+    if full_name is None and username:
+        # Tokens issued before full_name became a claim.
         user_doc = await get_user_by_username(username)
         if user_doc:
             full_name = user_doc.get("full_name") or user_doc.get("name")
@@ -61,18 +63,6 @@ async def _user_from_bearer(request: Request) -> tuple[Optional[str], Optional[s
         pass
     return user_id, full_name, username, class_from_token
 
-def _get_db_and_logs(request: Request):
-    db = getattr(request.app.state, "db", None)
-    logs = getattr(request.app.state, "logs_col", None)
-    if db is not None and logs is not None:
-        return db, logs
-    uri = os.getenv("MONGODB_URI")
-    dbname = os.getenv("DB_NAME", "brainbuddy")
-    client = MongoClient(uri, connect=True)
-    request.app.state.db = client[dbname]
-    request.app.state.logs_col = request.app.state.db["activity_logs"]
-    return request.app.state.db, request.app.state.logs_col
-
 def _ensure_storage(request: Request) -> Path:
     root = getattr(request.app.state, "storage_root", None)
     if root is not None:
@@ -83,84 +73,46 @@ def _ensure_storage(request: Request) -> Path:
     request.app.state.storage_root = p
     return p
 
-def _fetch_class_std(db, user_id: Optional[str], username: Optional[str], token_class: Optional[int]) -> int:
+async def _fetch_class_std(user_id: Optional[str], username: Optional[str], token_class: Optional[int]) -> int:
     if token_class is not None:
         return token_class
-    or_terms = []
-    if user_id:
-        or_terms += [
-            {"user_id": user_id},
-            {"userId": user_id},
-            {"userid": user_id},
-            {"linked_user_id": user_id},
-        ]
-    if username:
-        or_terms += [
-            {"username": username},
-            {"user_name": username},
-            {"email": username},
-        ]
-    if not or_terms:
+    if not user_id and not username:
         raise HTTPException(status_code=400, detail="no user identity")
-    doc = db["student_links"].find_one({"$or": or_terms})
-    if not doc:
+    class_std = await get_class_std(user_id, username)
+    if class_std is None:
         raise HTTPException(status_code=404, detail="student link not found")
-    val = (
-        doc.get("class_std")
-        or doc.get("classStd")
-        or doc.get("class")
-        or doc.get("grade_level")
-        or doc.get("grade")
-        or doc.get("std")
-    )
-    if val is None:
-        raise HTTPException(status_code=400, detail="class_std missing")
-    try:
-        import re
-        m = re.search(r"\d+", str(val))
-        if not m:
-            raise ValueError("no digit")
-        return int(m.group())
-    except Exception:
-        raise HTTPException(status_code=400, detail="invalid class_std")
+    return class_std
 
 def _validate_subject(subject: str, class_std: int) -> str:
     s = subject.strip().lower()
-    group = {"english", "maths", "science", "socialstudies", "social studies", "coding"}
+    group = {*PLAN_SUBJECTS, "social studies"}
     if (5 <= class_std <= 7 or 8 <= class_std <= 10) and s in group:
         return "socialstudies" if s == "social studies" else s
     raise HTTPException(status_code=400, detail="invalid subject for class_std")
 
-def _make_plan(class_std: int, subject: str) -> str:
-    prompt = f"""
-Generate a 4-week study plan for a student in class {class_std} for the subject "{subject}".
-Constraints:
-- 6 days per week, 60–90 minutes per day.
-- Mix concept learning, worked examples, active recall, spaced revision, and weekly mini-tests.
-- Use simple language for the student's level.
-- Output format:
-Week 1:
-- Day 1: ...
-- Day 2: ...
-Week 2:
-Week 3:
-Week 4:
-Tailor the topics to class {class_std} {subject}.
-"""
-    resp = flash_25.generate_content(prompt)
-    return (resp.text or "").strip()
-
 @router.post("/plan")
 async def make_study_plan(request: Request, body: StudyPlanRequest):
     user_id, name, username, token_class = await _user_from_bearer(request)
-    db, logs = _get_db_and_logs(request)
     _ensure_storage(request)
-    class_std = _fetch_class_std(db, user_id, username, token_class)
+    class_std = await _fetch_class_std(user_id, username, token_class)
     subject = _validate_subject(body.subject, class_std)
-    plan = _make_plan(class_std, subject)
+    if wants_stream(request):
+        async def finish(plan: str):
+            if not plan:
+                raise HTTPException(status_code=500, detail="plan generation failed")
+            await log_activity({
+                "user_id": user_id,
+                "name": name,
+                "data": {"type": "study_plan", "subject": subject, "class_std": class_std},
+                "output": {"plan": plan},
+                "datetime": datetime.now(timezone.utc).isoformat(),
+            })
+            return {"class_std": class_std, "subject": subject}
+        return sse_response("study", plan_store.stream(class_std, subject), finish)
+    plan = await plan_store.get(class_std, subject)
     if not plan:
         raise HTTPException(status_code=500, detail="plan generation failed")
-    logs.insert_one({
+    await log_activity({
         "user_id": user_id,
         "name": name,
         "data": {"type": "study_plan", "subject": subject, "class_std": class_std},
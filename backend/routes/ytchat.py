@@ -5,22 +5,30 @@ from pathlib import Path
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from pymongo import MongoClient
 from services.auth_service import decode_token, get_user_by_username
+from services.activity_log import log_activity
+from filelock import Timeout as LockTimeout
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import PromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import OpenAIEmbeddings
 from langchain_core.runnables import RunnableParallel, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
+from services.llm_client import ainvoke, astream
+from services.yt_index_store import yt_index_store
+from services.chain_cache import yt_chain_cache, estimate_vectorstore_bytes
+from services.embedding_cache import text_embeddings
+from services.singleflight import SingleFlight
+from services.study_classifier import study_classifier
 
 router = APIRouter()
 
 llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.3)
-embeddings = OpenAIEmbeddings(model='text-embedding-3-small')
-CHAIN_CACHE = {}
+embeddings = text_embeddings
+load_flights = SingleFlight()
+# Interval between non-blocking tries for another worker's build lock.
+YTCHAT_LOCK_POLL_SECONDS = float(os.getenv("YTCHAT_LOCK_POLL_SECONDS", "0.5"))
 
 class LoadVideoRequest(BaseModel):
     video_url: str
@@ -60,25 +68,14 @@ async def _user_from_bearer(request: Request) -> tuple[Optional[str], Optional[s
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
     user_id = payload.get("userId") or payload.get("user_id") or payload.get("userid")
     username = payload.get("sub") or payload.get("username") or payload.get("email")
-    full_name = None
-    if username:
+    full_name = payload.get("full_name")
+    if full_name is None and username:
+        # Tokens issued before full_name became a claim.
         user_doc = await get_user_by_username(username)
         if user_doc:
             full_name = user_doc.get("full_name") or user_doc.get("name")
     return user_id, full_name, username
 
-def _get_db_and_logs(request: Request):
-    db = getattr(request.app.state, "db", None)
-    logs = getattr(request.app.state, "logs_col", None)
-    if db is not None and logs is not None:
-        return db, logs
-    uri = os.getenv("MONGODB_URI")
-    dbname = os.getenv("DB_NAME", "brainbuddy")
-    client = MongoClient(uri, connect=True)
-    request.app.state.db = client[dbname]
-    request.app.state.logs_col = request.app.state.db["activity_logs"]
-    return request.app.state.db, request.app.state.logs_col
-
 def _ensure_storage(request: Request) -> Path:
     root = getattr(request.app.state, "storage_root", None)
     if root is not None:
@@ -106,22 +103,25 @@ def _get_transcript(video_id: str) -> str:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch transcript: {e}")
 
-def _is_study_related(transcript: str) -> bool:
+async def _is_study_related(transcript: str) -> bool:
+    return await study_classifier.decide(transcript, _llm_is_study_related)
+
+async def _llm_is_study_related(transcript: str) -> bool:
     snippet = transcript[:2000]
     prompt = f'You are a content classifier. Classify if the text is educational/study-related content for students preparing for school subjects. Respond with only "YES" or "NO".\n\nTEXT: "{snippet}"\n\nAnswer:'
-    try:
-        resp = llm.invoke(prompt)
-        ans = resp.content if hasattr(resp, "content") else str(resp)
-        return "YES" in ans.upper()
-    except Exception:
-        return False
+    # Errors propagate so study_classifier does not store them as "NO" labels.
+    resp = await ainvoke(llm, prompt, provider="gemini")
+    ans = resp.content if hasattr(resp, "content") else str(resp)
+    return "YES" in ans.upper()
 
-def _create_rag_chain(transcript: str):
+def _build_vectorstore(transcript: str) -> Optional[FAISS]:
     splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
     chunks = splitter.create_documents([transcript])
     if not chunks:
         return None
-    vs = FAISS.from_documents(chunks, embeddings)
+    return FAISS.from_documents(chunks, embeddings)
+
+def _rag_chain(vs: FAISS):
     retriever = vs.as_retriever(search_type="similarity", search_kwargs={"k": 4})
     prompt_template = """
 You are a helpful assistant.
@@ -138,16 +138,55 @@ Question:
     def _fmt(docs): return "\n\n".join(doc.page_content for doc in docs)
     return RunnableParallel({"context": retriever | _fmt, "question": RunnablePassthrough()}) | prompt | llm | StrOutputParser()
 
+async def _acquire(lock) -> None:
+    # Polls instead of blocking in to_thread: a wait of up to lock.timeout
+    # would tie up a thread of the default executor shared by every request.
+    deadline = asyncio.get_running_loop().time() + lock.timeout
+    while True:
+        try:
+            lock.acquire(timeout=0)
+            return
+        except LockTimeout:
+            if asyncio.get_running_loop().time() >= deadline:
+                raise
+        await asyncio.sleep(YTCHAT_LOCK_POLL_SECONDS)
+
+async def _create_rag_chain(vid: str):
+    # The file lock makes other workers wait for this build and then load the
+    # stored index instead of embedding the same transcript again.
+    lock = yt_index_store.lock(vid)
+    if lock is not None:
+        try:
+            await _acquire(lock)
+        except LockTimeout:
+            raise HTTPException(status_code=503, detail="Video is still being processed, please retry shortly.")
+    try:
+        vs = await asyncio.to_thread(yt_index_store.load, vid, embeddings)
+        if vs is None:
+            transcript = await asyncio.to_thread(_get_transcript, vid)
+            ok = await _is_study_related(transcript)
+            if not ok:
+                raise HTTPException(status_code=400, detail="This video is not study-related")
+            vs = await asyncio.to_thread(_build_vectorstore, transcript)
+            if vs is None:
+                raise HTTPException(status_code=500, detail="Failed to process transcript")
+            await asyncio.to_thread(yt_index_store.save, vid, vs)
+    finally:
+        if lock is not None:
+            lock.release()
+    chain = _rag_chain(vs)
+    yt_chain_cache.put(vid, chain, estimate_vectorstore_bytes(vs))
+    return chain
+
 @router.post("/load")
 async def load_video(request: Request, body: LoadVideoRequest):
     user_id, name, _ = await _user_from_bearer(request)
-    db, logs = _get_db_and_logs(request)
     _ensure_storage(request)
     vid = _get_video_id(body.video_url)
     if not vid:
         raise HTTPException(status_code=400, detail="Invalid YouTube URL")
-    if vid in CHAIN_CACHE:
-        logs.insert_one({
+    if yt_chain_cache.get(vid) is not None:
+        await log_activity({
             "user_id": user_id,
             "name": name,
             "data": {"type": "yt_chat", "action": "load_video", "video_id": vid, "url": body.video_url, "cached": True},
@@ -155,15 +194,8 @@ async def load_video(request: Request, body: LoadVideoRequest):
             "datetime": datetime.now(timezone.utc).isoformat(),
         })
         return {"status": "success", "video_id": vid, "message": "Video already loaded and ready."}
-    transcript = await asyncio.to_thread(_get_transcript, vid)
-    ok = await asyncio.to_thread(_is_study_related, transcript)
-    if not ok:
-        raise HTTPException(status_code=400, detail="This video is not study-related")
-    chain = await asyncio.to_thread(_create_rag_chain, transcript)
-    if not chain:
-        raise HTTPException(status_code=500, detail="Failed to process transcript")
-    CHAIN_CACHE[vid] = chain
-    logs.insert_one({
+    await load_flights.do(vid, lambda: _create_rag_chain(vid))
+    await log_activity({
         "user_id": user_id,
         "name": name,
         "data": {"type": "yt_chat", "action": "load_video", "video_id": vid, "url": body.video_url, "cached": False},
@@ -175,18 +207,20 @@ async def load_video(request: Request, body: LoadVideoRequest):
 @router.post("/ask")
 async def ask_question(request: Request, body: AskQuestionRequest):
     user_id, name, _ = await _user_from_bearer(request)
-    db, logs = _get_db_and_logs(request)
-    if body.video_id not in CHAIN_CACHE:
-        raise HTTPException(status_code=404, detail="Video not loaded")
-    chain = CHAIN_CACHE[body.video_id]
+    chain = yt_chain_cache.get(body.video_id)
+    if chain is None:
+        # Evicted or loaded by another worker: rebuild from the stored index.
+        if not await asyncio.to_thread(yt_index_store.exists, body.video_id):
+            raise HTTPException(status_code=404, detail="Video not loaded")
+        chain = await load_flights.do(body.video_id, lambda: _create_rag_chain(body.video_id))
     agg = []
     async def gen():
-        async for chunk in chain.astream(body.question):
+        async for chunk in astream(chain, body.question, provider="gemini"):
             s = str(chunk)
             agg.append(s)
             yield s
         try:
-            logs.insert_one({
+            await log_activity({
                 "user_id": user_id,
                 "name": name,
                 "data": {"type": "yt_chat", "action": "ask_question", "video_id": body.video_id, "question": body.question},
@@ -0,0 +1,87 @@
+"""Train the local ytchat study-relatedness classifier.
+
+Run from the backend directory:
+
+    python scripts/train_study_classifier.py transcripts.jsonl
+    python scripts/train_study_classifier.py --from-db
+
+Each input line is {"text": "...", "label": 1 or 0} (1 = study-related).
+--from-db instead reads the study_classifier_labels collection, where ytchat
+stores every LLM decision with its transcript snippet (MONGODB_URI/DB_NAME).
+Fits TF-IDF + logistic regression, reports held-out accuracy and how many
+cases would still go to the LLM with the configured thresholds, and writes
+the pipeline to YTCHAT_CLASSIFIER_PATH (models/study_classifier.joblib).
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from joblib import dump
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+from services.study_classifier import (
+    YTCHAT_CLASSIFIER_CHARS,
+    YTCHAT_CLASSIFIER_HIGH,
+    YTCHAT_CLASSIFIER_LOW,
+    YTCHAT_CLASSIFIER_PATH,
+)
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_db(collection):
+    import certifi
+    from pymongo import MongoClient
+    from services.db import MONGO_URI, DB_NAME
+    opts = {"tlsCAFile": certifi.where()} if MONGO_URI.startswith("mongodb+srv") else {}
+    with MongoClient(MONGO_URI, **opts) as client:
+        yield from client[DB_NAME][collection].find({}, {"text": 1, "label": 1})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("data", nargs="?")
+    parser.add_argument("--from-db", action="store_true")
+    parser.add_argument("--collection", default="study_classifier_labels")
+    parser.add_argument("--out", default=YTCHAT_CLASSIFIER_PATH)
+    args = parser.parse_args()
+    if bool(args.data) == args.from_db:
+        parser.error("give a JSONL file or --from-db")
+
+    texts, labels = [], []
+    for row in (read_db(args.collection) if args.from_db else read_jsonl(args.data)):
+        texts.append(row["text"][:YTCHAT_CLASSIFIER_CHARS])
+        labels.append(int(row["label"]))
+
+    x_train, x_test, y_train, y_test = train_test_split(texts, labels, test_size=0.2, random_state=0, stratify=labels)
+    model = make_pipeline(
+        TfidfVectorizer(sublinear_tf=True, ngram_range=(1, 2), min_df=2, max_features=100000),
+        LogisticRegression(max_iter=1000, class_weight="balanced"),
+    )
+    model.fit(x_train, y_train)
+
+    probs = model.predict_proba(x_test)[:, 1]
+    confident = [(p >= YTCHAT_CLASSIFIER_HIGH or p <= YTCHAT_CLASSIFIER_LOW, p >= 0.5, y) for p, y in zip(probs, y_test)]
+    decided = [(pred, y) for ok, pred, y in confident if ok]
+    print(f"held-out accuracy: {sum(pred == y for _, pred, y in confident) / len(confident):.3f}")
+    print(f"decided locally:   {len(decided) / len(confident):.1%}")
+    if decided:
+        print(f"local accuracy:    {sum(pred == y for pred, y in decided) / len(decided):.3f}")
+
+    model.fit(texts, labels)
+    dump(model, args.out)
+    print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
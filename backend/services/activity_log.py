@@ -0,0 +1,138 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+ACTIVITY_LOG_QUEUE_MAX = int(os.getenv("ACTIVITY_LOG_QUEUE_MAX", "10000"))
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "200"))
+ACTIVITY_LOG_FLUSH_SECONDS = float(os.getenv("ACTIVITY_LOG_FLUSH_SECONDS", "1.0"))
+# "drop" discards new entries when the queue is full, "block" waits up to
+# ACTIVITY_LOG_BLOCK_SECONDS for room before dropping.
+ACTIVITY_LOG_POLICY = os.getenv("ACTIVITY_LOG_POLICY", "drop").lower()
+ACTIVITY_LOG_BLOCK_SECONDS = float(os.getenv("ACTIVITY_LOG_BLOCK_SECONDS", "0.05"))
+ACTIVITY_LOG_SHUTDOWN_SECONDS = float(os.getenv("ACTIVITY_LOG_SHUTDOWN_SECONDS", "10"))
+
+_STOP = object()
+
+
+class ActivityLogWriter:
+    def __init__(
+        self,
+        queue_max: int = ACTIVITY_LOG_QUEUE_MAX,
+        batch_size: int = ACTIVITY_LOG_BATCH_SIZE,
+        flush_seconds: float = ACTIVITY_LOG_FLUSH_SECONDS,
+        policy: str = ACTIVITY_LOG_POLICY,
+        block_seconds: float = ACTIVITY_LOG_BLOCK_SECONDS,
+    ):
+        self.queue_max = queue_max
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.policy = policy
+        self.block_seconds = block_seconds
+        self._col = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "flushes": 0}
+
+    def start(self, col) -> None:
+        if self._task is not None:
+            return
+        self._col = col
+        self._queue = asyncio.Queue(maxsize=self.queue_max)
+        self._task = asyncio.create_task(self._run(), name="activity-log-writer")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout=ACTIVITY_LOG_SHUTDOWN_SECONDS)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            log.warning("activity log writer did not drain in time; %d entries lost", self._queue.qsize())
+        self._task = None
+
+    async def write(self, doc: Dict[str, Any]) -> bool:
+        if self._queue is None:
+            self.stats["dropped"] += 1
+            return False
+        try:
+            self._queue.put_nowait(doc)
+        except asyncio.QueueFull:
+            if self.policy != "block":
+                self.stats["dropped"] += 1
+                return False
+            try:
+                await asyncio.wait_for(self._queue.put(doc), timeout=self.block_seconds)
+            except asyncio.TimeoutError:
+                self.stats["dropped"] += 1
+                return False
+        self.stats["enqueued"] += 1
+        return True
+
+    async def write_many(self, docs: List[Dict[str, Any]]) -> bool:
+        # Bulk callers already have their entries together, so they go out as
+        # a single insert_many instead of through the queue.
+        if not docs:
+            return True
+        if self._col is None:
+            self.stats["dropped"] += len(docs)
+            return False
+        self.stats["enqueued"] += len(docs)
+        await self._flush(docs)
+        return True
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch: List[Dict[str, Any]] = [item]
+            deadline = loop.time() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+        rest = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                rest.append(item)
+        for i in range(0, len(rest), self.batch_size):
+            await self._flush(rest[i:i + self.batch_size])
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            await self._col.insert_many(batch, ordered=False)
+            self.stats["written"] += len(batch)
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            log.warning("activity log flush of %d entries failed: %s", len(batch), e)
+        self.stats["flushes"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "queued": self._queue.qsize() if self._queue is not None else 0}
+
+
+activity_log = ActivityLogWriter()
+
+
+async def log_activity(doc: Dict[str, Any]) -> bool:
+    return await activity_log.write(doc)
+
+
+async def log_activity_many(docs: List[Dict[str, Any]]) -> bool:
+    return await activity_log.write_many(docs)
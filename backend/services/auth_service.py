@@ -1,51 +1,174 @@
 import os
+import re
+import time
+import asyncio
+import logging
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
 
-import certifi
 from bson import ObjectId
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from jose import jwt, JWTError
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from passlib.context import CryptContext
 from passlib.exc import UnknownHashError
 from typing_extensions import Annotated
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
 from uuid import uuid4
+from services.db import get_db
+from services.password_hasher import PasswordHasher
 
 load_dotenv()
+log = logging.getLogger(__name__)
 
-MONGO_URI = os.getenv("MONGODB_URI")
-DB_NAME = os.getenv("DB_NAME")
 JWT_SECRET = os.getenv("SECRET_KEY")
 JWT_ALG = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
-
-_client = AsyncIOMotorClient(MONGO_URI, tlsCAFile=certifi.where()) if MONGO_URI.startswith("mongodb+srv") else AsyncIOMotorClient(MONGO_URI)
-db: AsyncIOMotorDatabase = _client[DB_NAME]
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX = int(os.getenv("USER_CACHE_MAX", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+TOKEN_CACHE_MAX = int(os.getenv("TOKEN_CACHE_MAX", "10000"))
+TOKEN_REVOCATION_REFRESH_SECONDS = float(os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", "30"))
+USER_LIST_PAGE_SIZE = int(os.getenv("USER_LIST_PAGE_SIZE", "100"))
+USER_LIST_MAX_PAGE_SIZE = int(os.getenv("USER_LIST_MAX_PAGE_SIZE", "1000"))
+
+db: AsyncIOMotorDatabase = get_db()
 users_coll = db.get_collection("users")
 counters_coll = db.get_collection("counters")
 student_links_coll = db.get_collection("student_links")
+token_revocations_coll = db.get_collection("token_revocations")
+
+class _Cache:
+    def __init__(self, maxsize: int, ttl: float):
+        self._data = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        val = self._data.get(key)
+        if val is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return val
+
+    def set(self, key: str, val: Dict[str, Any]) -> None:
+        self._data[key] = val
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._data),
+        }
+
+
+# Per-worker caches for user documents (by username) and decoded token
+# claims (by raw token). Writes that change a user go through
+# invalidate_user; other workers converge within USER_CACHE_TTL_SECONDS.
+_user_cache = _Cache(USER_CACHE_MAX, USER_CACHE_TTL_SECONDS)
+_claims_cache = _Cache(TOKEN_CACHE_MAX, TOKEN_CACHE_TTL_SECONDS)
+_class_cache = _Cache(USER_CACHE_MAX, USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(username: Optional[str], user_id: Optional[str] = None) -> None:
+    if username:
+        _user_cache.pop(username)
+    if user_id:
+        _class_cache.pop(user_id)
+
+
+# Tokens carry a "tv" (token version) claim. Bumping a user's tokenVersion
+# revokes every token issued before it; the per-user minimum versions are
+# mirrored in memory from the token_revocations collection so the check in
+# decode_token never touches the database.
+class _TokenRevocations:
+    def __init__(self):
+        self._min_version: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        user_id = payload.get("userId")
+        if not user_id or user_id not in self._min_version:
+            return False
+        return int(payload.get("tv") or 0) < self._min_version[user_id]
+
+    async def revoke_before(self, user_id: str, version: int) -> None:
+        self._min_version[user_id] = max(version, self._min_version.get(user_id, 0))
+        await token_revocations_coll.update_one(
+            {"_id": user_id}, {"$max": {"tokenVersion": version}}, upsert=True
+        )
+
+    async def refresh(self) -> None:
+        async for doc in token_revocations_coll.find({}):
+            uid, version = doc["_id"], int(doc.get("tokenVersion", 0))
+            self._min_version[uid] = max(version, self._min_version.get(uid, 0))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="token-revocations")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.warning("token revocation refresh failed: %s", e)
+            await asyncio.sleep(TOKEN_REVOCATION_REFRESH_SECONDS)
+
+
+token_revocations = _TokenRevocations()
+
+
+def auth_cache_metrics() -> Dict[str, Any]:
+    return {
+        "users": _user_cache.metrics(),
+        "token_claims": _claims_cache.metrics(),
+        "class_std": _class_cache.metrics(),
+        "revoked_users": len(token_revocations._min_version),
+    }
+
 
 pwd_context = CryptContext(
     schemes=["bcrypt", "pbkdf2_sha256", "argon2", "sha256_crypt"],
     deprecated="auto",
 )
 
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+password_hasher = PasswordHasher(pwd_context)
 
 
-def verify_password(plain: str, hashed: str) -> bool:
-    if not hashed or not isinstance(hashed, str):
-        return False
+def _verify_sync(plain: str, hashed: str) -> bool:
     try:
         return pwd_context.verify(plain, hashed)
     except UnknownHashError:
         return False
 
 
+async def hash_password(password: str) -> str:
+    return await password_hasher.run(pwd_context.hash, password)
+
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    if not hashed or not isinstance(hashed, str):
+        return False
+    return await password_hasher.run(_verify_sync, plain, hashed)
+
+
 class UserCreate(BaseModel):
     username: str = Field(min_length=3, max_length=64)
     password: str = Field(min_length=6, max_length=128)
@@ -154,14 +277,23 @@ def _doc_to_public(doc: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def _ensure_indexes_started():
-    users_coll.create_index("username", unique=True)
-    users_coll.create_index("userId", unique=True)
-    users_coll.create_index("user_id", unique=True)
-    student_links_coll.create_index("userId", unique=True)
-    student_links_coll.create_index("email")
-
-_ensure_indexes_started()
+async def ensure_indexes() -> None:
+    specs = [
+        (users_coll, "username", {"unique": True}),
+        (users_coll, "userId", {"unique": True}),
+        (users_coll, "user_id", {"unique": True}),
+        (student_links_coll, "userId", {"unique": True}),
+        (student_links_coll, "email", {}),
+        # Admin user listing: filters plus keyset pagination on _id.
+        (users_coll, [("roles", 1), ("_id", 1)], {}),
+        (users_coll, [("isActive", 1), ("_id", 1)], {}),
+        (users_coll, [("createdAt", 1), ("_id", 1)], {}),
+    ]
+    for coll, key, opts in specs:
+        try:
+            await coll.create_index(key, **opts)
+        except Exception as e:
+            log.warning("index %s.%s not created: %s", coll.name, key, e)
 
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
@@ -172,22 +304,149 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
 
 
 def decode_token(token: str) -> Dict[str, Any]:
-    try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
-    except JWTError as e:
-        raise ValueError(f"Invalid token: {e}")
+    payload = _claims_cache.get(token)
+    if payload is not None and payload.get("exp", 0) <= time.time():
+        _claims_cache.pop(token)
+        payload = None
+    if payload is None:
+        try:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        except JWTError as e:
+            raise ValueError(f"Invalid token: {e}")
+        _claims_cache.set(token, payload)
+    if token_revocations.is_revoked(payload):
+        raise ValueError("Invalid token: revoked")
+    return dict(payload)
 
 
-def issue_access_token_for_user(user_doc: Dict[str, Any]) -> str:
+def _parse_class_std(val: Any) -> Optional[int]:
+    if isinstance(val, int):
+        return val
+    m = re.search(r"\d+", str(val)) if val is not None else None
+    return int(m.group()) if m else None
+
+
+async def get_class_std(user_id: Optional[str], username: Optional[str] = None) -> Optional[int]:
+    """Class of the student linked to this user: one indexed read, cached per user."""
+    if not user_id and username:
+        user_doc = await get_user_by_username(username)
+        user_id = (user_doc or {}).get("userId") or (user_doc or {}).get("user_id")
+    if not user_id:
+        return None
+    cached = _class_cache.get(user_id)
+    if cached is not None:
+        return cached["class_std"]
+    link = await student_links_coll.find_one({"userId": user_id}, {"class_std": 1})
+    class_std = _parse_class_std((link or {}).get("class_std"))
+    _class_cache.set(user_id, {"class_std": class_std})
+    return class_std
+
+
+# Legacy student_links documents name the owner and class under several
+# different fields. Rewrite them once to the canonical, indexed userId and an
+# int class_std so lookups never need an $or over unindexed fields.
+_LEGACY_LINK_ID_FIELDS = ("user_id", "userid", "linked_user_id")
+_LEGACY_LINK_NAME_FIELDS = ("username", "user_name", "email")
+_LEGACY_CLASS_FIELDS = ("class_std", "classStd", "class", "grade_level", "grade", "std")
+
+
+async def migrate_student_links() -> int:
+    query = {"$or": [{"userId": {"$exists": False}}, {"class_std": {"$not": {"$type": "int"}}}]}
+    migrated = 0
+    try:
+        async for doc in student_links_coll.find(query):
+            updates: Dict[str, Any] = {}
+            user_id = doc.get("userId") or next((doc[f] for f in _LEGACY_LINK_ID_FIELDS if doc.get(f)), None)
+            if not user_id:
+                for f in _LEGACY_LINK_NAME_FIELDS:
+                    if not doc.get(f):
+                        continue
+                    owner = await users_coll.find_one(
+                        {"$or": [{"username": doc[f]}, {"email": doc[f]}]}, {"userId": 1, "user_id": 1}
+                    )
+                    user_id = (owner or {}).get("userId") or (owner or {}).get("user_id")
+                    if user_id:
+                        break
+            if user_id and doc.get("userId") != user_id:
+                updates["userId"] = user_id
+            class_std = next(
+                (c for c in (_parse_class_std(doc.get(f)) for f in _LEGACY_CLASS_FIELDS) if c is not None), None
+            )
+            if class_std is not None and doc.get("class_std") != class_std:
+                updates["class_std"] = class_std
+            if not updates:
+                continue
+            try:
+                await student_links_coll.update_one({"_id": doc["_id"]}, {"$set": updates})
+                migrated += 1
+            except Exception as e:
+                log.warning("student link %s not migrated: %s", doc["_id"], e)
+    except Exception as e:
+        log.warning("student link migration failed: %s", e)
+    if migrated:
+        log.info("migrated %d legacy student links", migrated)
+    return migrated
+
+
+# Legacy user documents keep role, disabled and created_at (or only the
+# ObjectId timestamp) instead of roles, isActive and createdAt. The user
+# listing filters on the canonical fields, so fill them in once from the same
+# fallbacks _doc_to_public applies.
+async def migrate_users() -> int:
+    query = {"$or": [
+        {"roles": None},
+        {"roles": {"$size": 0}, "role": {"$nin": [None, ""]}},
+        {"isActive": {"$exists": False}},
+        {"createdAt": {"$exists": False}},
+    ]}
+    migrated = 0
+    try:
+        async for doc in users_coll.find(query):
+            public = _doc_to_public(doc)
+            updates = {f: public[f] for f in ("roles", "isActive", "createdAt") if doc.get(f) != public[f]}
+            if not updates:
+                continue
+            try:
+                await users_coll.update_one({"_id": doc["_id"]}, {"$set": updates})
+                migrated += 1
+            except Exception as e:
+                log.warning("user %s not migrated: %s", doc["_id"], e)
+    except Exception as e:
+        log.warning("user migration failed: %s", e)
+    if migrated:
+        log.info("migrated %d legacy users", migrated)
+    return migrated
+
+
+async def issue_access_token_for_user(user_doc: Dict[str, Any]) -> str:
+    # Claims are a snapshot; callers refresh them by re-issuing the token.
+    # Read straight from Mongo rather than the per-worker caches so a fresh
+    # token never repeats a stale tokenVersion, roles or class.
+    raw = await users_coll.find_one({"username": user_doc.get("username") or ""}) or user_doc
+    public = _doc_to_public(raw)
     payload = {
-        "sub": user_doc.get("username"),
-        "userId": user_doc.get("userId"),
+        "sub": public["username"],
+        "userId": public["userId"],
+        "full_name": public["full_name"],
+        "roles": public["roles"],
+        "tv": int(raw.get("tokenVersion") or 0),
     }
+    link = await student_links_coll.find_one({"userId": public["userId"]}, {"class_std": 1}) if public["userId"] else None
+    class_std = _parse_class_std((link or {}).get("class_std"))
+    if class_std is not None:
+        payload["class_std"] = class_std
     return create_access_token(payload)
 
 
 async def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
-    return await users_coll.find_one({"username": username})
+    cached = _user_cache.get(username)
+    if cached is not None:
+        return dict(cached)
+    doc = await users_coll.find_one({"username": username})
+    if doc is not None:
+        _user_cache.set(username, doc)
+        return dict(doc)
+    return None
 
 
 async def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
@@ -208,7 +467,7 @@ async def create_user(payload: UserCreate) -> Dict[str, Any]:
     now = datetime.utcnow()
     user_doc = {
         "username": payload.username,
-        "hashed_password": hash_password(payload.password),
+        "hashed_password": await hash_password(payload.password),
         "email": payload.email or "",
         "full_name": payload.full_name or "",
         "userId": str(uuid4()),
@@ -221,12 +480,70 @@ async def create_user(payload: UserCreate) -> Dict[str, Any]:
     user_doc["_id"] = ins.inserted_id
     return _doc_to_public(user_doc)
 
-async def list_users() -> List[Dict[str, Any]]:
-    cur = users_coll.find({})
-    users: List[Dict[str, Any]] = []
+# Only the fields _doc_to_public reads; never ship password hashes to the app.
+_USER_PUBLIC_PROJECTION = {
+    f: 1 for f in (
+        "userId", "user_id", "username", "full_name", "name", "email",
+        "createdAt", "created_at", "updatedAt", "updated_at",
+        "isActive", "disabled", "roles", "role",
+    )
+}
+
+
+def _user_list_query(
+    after: Optional[str] = None,
+    role: Optional[str] = None,
+    active: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    if after:
+        try:
+            query["_id"] = {"$gt": ObjectId(after)}
+        except Exception:
+            raise ValueError("Invalid cursor")
+    if role:
+        query["roles"] = role
+    if active is not None:
+        query["isActive"] = active
+    created: Dict[str, Any] = {}
+    if created_from is not None:
+        created["$gte"] = created_from
+    if created_to is not None:
+        created["$lt"] = created_to
+    if created:
+        query["createdAt"] = created
+    return query
+
+
+async def list_users(
+    limit: int = USER_LIST_PAGE_SIZE,
+    after: Optional[str] = None,
+    role: Optional[str] = None,
+    active: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Return one page of users ordered by _id and the cursor for the next page."""
+    limit = max(1, min(limit, USER_LIST_MAX_PAGE_SIZE))
+    query = _user_list_query(after, role, active, created_from, created_to)
+    cur = users_coll.find(query, _USER_PUBLIC_PROJECTION).sort("_id", 1).limit(limit + 1)
+    docs = await cur.to_list(length=limit + 1)
+    next_cursor = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
+    return [_doc_to_public(doc) for doc in docs[:limit]], next_cursor
+
+
+async def iter_users(
+    role: Optional[str] = None,
+    active: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    query = _user_list_query(None, role, active, created_from, created_to)
+    cur = users_coll.find(query, _USER_PUBLIC_PROJECTION).sort("_id", 1).batch_size(USER_LIST_MAX_PAGE_SIZE)
     async for doc in cur:
-        users.append(_doc_to_public(doc))
-    return users
+        yield _doc_to_public(doc)
 
 
 async def update_me(username: str, payload: UserUpdateSelf) -> Dict[str, Any]:
@@ -246,6 +563,7 @@ async def update_me(username: str, payload: UserUpdateSelf) -> Dict[str, Any]:
         {"$set": updates},
         return_document=True,
     )
+    invalidate_user(username)
     if not res:
         raise ValueError("User not found")
     return _doc_to_public(res)
@@ -264,19 +582,32 @@ async def admin_update_user(user_id: str, payload: UserAdminUpdate) -> Dict[str,
         updates["isActive"] = bool(payload.isActive)
     if payload.roles is not None:
         updates["roles"] = [str(r) for r in payload.roles]
+    current = await users_coll.find_one({"_id": oid})
+    if not current:
+        raise ValueError("User not found")
     if not updates:
-        doc = await users_coll.find_one({"_id": oid})
-        if not doc:
-            raise ValueError("User not found")
-        return _doc_to_public(doc)
+        return _doc_to_public(current)
+    before = _doc_to_public(current)
     updates["updatedAt"] = datetime.utcnow()
+    change: Dict[str, Any] = {"$set": updates}
+    # Deactivation or a role change must not be outlived by existing tokens;
+    # re-sending the stored values leaves issued tokens alone.
+    revoke = ("isActive" in updates and updates["isActive"] != before["isActive"]) or (
+        "roles" in updates and updates["roles"] != before["roles"]
+    )
+    if revoke:
+        change["$inc"] = {"tokenVersion": 1}
     res = await users_coll.find_one_and_update(
         {"_id": oid},
-        {"$set": updates},
+        change,
         return_document=True,
     )
     if not res:
         raise ValueError("User not found")
+    invalidate_user(res.get("username"))
+    user_key = res.get("userId") or res.get("user_id")
+    if revoke and user_key:
+        await token_revocations.revoke_before(user_key, int(res.get("tokenVersion") or 0))
     return _doc_to_public(res)
 
 async def authenticate_user(username: str, password: str) -> Optional[Dict[str, Any]]:
@@ -284,14 +615,16 @@ async def authenticate_user(username: str, password: str) -> Optional[Dict[str,
     if not doc:
         return None
     stored = doc.get("hashed_password", "")
-    if verify_password(password, stored):
+    if await verify_password(password, stored):
         if pwd_context.needs_update(stored):
-            new_hash = hash_password(password)
+            new_hash = await hash_password(password)
             await users_coll.update_one({"_id": doc["_id"]}, {"$set": {"hashed_password": new_hash}})
+            invalidate_user(username)
         return _doc_to_public(doc)
     if stored and stored == password:
-        new_hash = hash_password(password)
+        new_hash = await hash_password(password)
         await users_coll.update_one({"_id": doc["_id"]}, {"$set": {"hashed_password": new_hash}})
+        invalidate_user(username)
         doc = await users_coll.find_one({"_id": doc["_id"]})
         return _doc_to_public(doc)
     return None
@@ -332,6 +665,7 @@ async def link_student_email_for_user(username: str, email: str, class_std: int)
         upsert=True,
         return_document=True,
     )
+    invalidate_user(username, user_id)
 
     return {
         "id": str(res.get("_id")) if res and res.get("_id") else "",
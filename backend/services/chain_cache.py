@@ -0,0 +1,76 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+YTCHAT_CACHE_MAX_BYTES = int(os.getenv("YTCHAT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+YTCHAT_CACHE_IDLE_SECONDS = float(os.getenv("YTCHAT_CACHE_IDLE_SECONDS", "3600"))
+# Rough per-chunk cost of the Document object, docstore entry and id mapping.
+_DOC_OVERHEAD_BYTES = 600
+
+
+def estimate_vectorstore_bytes(vs) -> int:
+    index = vs.index
+    size = index.ntotal * index.d * 4
+    for doc_id in vs.index_to_docstore_id.values():
+        doc = vs.docstore.search(doc_id)
+        size += len(getattr(doc, "page_content", "")) + _DOC_OVERHEAD_BYTES
+    return size
+
+
+# LRU cache with a byte budget and an idle TTL. Values are whatever the caller
+# stores (ytchat keeps RAG chains); the size of each entry is supplied on put.
+class ChainCache:
+    def __init__(self, max_bytes: int = YTCHAT_CACHE_MAX_BYTES, idle_seconds: float = YTCHAT_CACHE_IDLE_SECONDS):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        self._expire()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        value, size, _ = entry
+        self._entries[key] = (value, size, time.monotonic())
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def put(self, key: str, value: Any, size: int) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (value, size, time.monotonic())
+        self._bytes += size
+        self._expire()
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.stats["evictions"] += 1
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._entries:
+            key, (_, size, last_used) = next(iter(self._entries.items()))
+            if last_used > cutoff:
+                break
+            del self._entries[key]
+            self._bytes -= size
+            self.stats["expirations"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+yt_chain_cache = ChainCache()
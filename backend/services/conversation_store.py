@@ -0,0 +1,154 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+log = logging.getLogger(__name__)
+
+TUTOR_HISTORY_MAX_MESSAGES = int(os.getenv("TUTOR_HISTORY_MAX_MESSAGES", "40"))
+TUTOR_HISTORY_MAX_BYTES = int(os.getenv("TUTOR_HISTORY_MAX_BYTES", str(32 * 1024)))
+TUTOR_HISTORY_IDLE_SECONDS = float(os.getenv("TUTOR_HISTORY_IDLE_SECONDS", "1800"))
+TUTOR_HISTORY_MAX_CONVERSATIONS = int(os.getenv("TUTOR_HISTORY_MAX_CONVERSATIONS", "5000"))
+TUTOR_CONTEXT_MESSAGES = int(os.getenv("TUTOR_CONTEXT_MESSAGES", "8"))
+
+ConversationKey = Tuple[str, str]
+
+
+def _size(message: Dict[str, str]) -> int:
+    return len(message["message"].encode("utf-8"))
+
+
+# Tutor conversations keyed by (user, conversation_id). Each conversation
+# keeps at most max_messages / max_bytes, dropping the oldest messages first.
+# Memory holds an LRU of recently active conversations (idle ones are evicted
+# and reloaded from Mongo on demand). Appends are pushed to Mongo atomically
+# and the stored document replaces the cached copy, so workers never
+# overwrite each other's turns. Mongo keeps the last max_messages; the byte
+# cap is applied when the document is read back.
+class ConversationStore:
+    def __init__(
+        self,
+        max_messages: int = TUTOR_HISTORY_MAX_MESSAGES,
+        max_bytes: int = TUTOR_HISTORY_MAX_BYTES,
+        idle_seconds: float = TUTOR_HISTORY_IDLE_SECONDS,
+        max_conversations: int = TUTOR_HISTORY_MAX_CONVERSATIONS,
+        window: int = TUTOR_CONTEXT_MESSAGES,
+    ):
+        self.max_messages = max(2, max_messages)
+        self.max_bytes = max(1024, max_bytes)
+        self.idle_seconds = idle_seconds
+        self.max_conversations = max(1, max_conversations)
+        self.window = max(0, window)
+        self._entries: "OrderedDict[ConversationKey, Tuple[List[Dict[str, str]], float]]" = OrderedDict()
+        self._coll = None
+        self.stats = {"loads": 0, "writes": 0, "write_failures": 0, "evictions": 0, "trimmed": 0}
+
+    def start(self, coll) -> None:
+        self._coll = coll
+
+    @staticmethod
+    def _id(key: ConversationKey) -> str:
+        return f"{key[0]}:{key[1]}"
+
+    async def get(self, user: str, conversation_id: str) -> List[Dict[str, str]]:
+        key = (user, conversation_id)
+        self._expire()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._touch(key, entry[0])
+            return list(entry[0])
+        messages: List[Dict[str, str]] = []
+        if self._coll is not None:
+            try:
+                doc = await self._coll.find_one({"_id": self._id(key)}, {"messages": 1})
+                messages = list((doc or {}).get("messages") or [])
+                self.stats["loads"] += 1
+            except Exception as e:
+                log.warning("loading tutor conversation failed: %s", e)
+        messages = self._trim(messages)
+        self._touch(key, messages)
+        return list(messages)
+
+    async def append(self, user: str, conversation_id: str, *new: Dict[str, str]) -> List[Dict[str, str]]:
+        key = (user, conversation_id)
+        added = []
+        for m in new:
+            text = m["message"]
+            if len(text.encode("utf-8")) > self.max_bytes:
+                text = text.encode("utf-8")[: self.max_bytes].decode("utf-8", "ignore")
+            added.append({"role": m["role"], "message": text})
+        if self._coll is None:
+            messages = await self.get(user, conversation_id) + added
+        else:
+            # $push appends to whatever is stored, so turns written by other
+            # workers since this one cached the conversation are kept; the
+            # returned document becomes the in-memory copy.
+            try:
+                doc = await self._coll.find_one_and_update(
+                    {"_id": self._id(key)},
+                    {
+                        "$push": {"messages": {"$each": added, "$slice": -self.max_messages}},
+                        "$set": {
+                            "user_id": user,
+                            "conversation_id": conversation_id,
+                            "updatedAt": datetime.now(timezone.utc),
+                        },
+                    },
+                    projection={"messages": 1},
+                    upsert=True,
+                    return_document=True,
+                )
+                messages = list((doc or {}).get("messages") or added)
+                self.stats["writes"] += 1
+            except Exception as e:
+                self.stats["write_failures"] += 1
+                log.warning("persisting tutor conversation failed: %s", e)
+                messages = await self.get(user, conversation_id) + added
+        messages = self._trim(messages)
+        self._touch(key, messages)
+        return list(messages)
+
+    def context(self, messages: List[Dict[str, str]]) -> List[Tuple[str, str]]:
+        """The last `window` messages as (role, text) pairs for a MessagesPlaceholder."""
+        if not self.window:
+            return []
+        return [(m["role"], m["message"]) for m in messages[-self.window:]]
+
+    def _trim(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        total = sum(_size(m) for m in messages)
+        drop = 0
+        while drop < len(messages) - 1 and (len(messages) - drop > self.max_messages or total > self.max_bytes):
+            total -= _size(messages[drop])
+            drop += 1
+        if drop:
+            self.stats["trimmed"] += drop
+        return messages[drop:]
+
+    def _touch(self, key: ConversationKey, messages: List[Dict[str, str]]) -> None:
+        self._entries[key] = (messages, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_conversations:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._entries:
+            key, (_, last_used) = next(iter(self._entries.items()))
+            if last_used > cutoff:
+                break
+            del self._entries[key]
+            self.stats["evictions"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "conversations": len(self._entries),
+            "bytes": sum(_size(m) for msgs, _ in self._entries.values() for m in msgs),
+            "max_conversations": self.max_conversations,
+        }
+
+
+conversation_store = ConversationStore()
@@ -1,12 +1,43 @@
+import os
+import io
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 from fastapi import HTTPException
 import fitz  # PyMuPDF
-import io
 import docx
 
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_RANGE_PAGES = int(os.getenv("PDF_RANGE_PAGES", "32"))
+PDF_PAGE_TIMEOUT_SECONDS = float(os.getenv("PDF_PAGE_TIMEOUT_SECONDS", "5"))
+# Pages are joined with form feeds so later stages can split by page.
+PAGE_SEPARATOR = "\f"
+
+
+def iter_pdf_pages(doc: "fitz.Document", start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    for i in range(start, doc.page_count if stop is None else min(stop, doc.page_count)):
+        yield doc.load_page(i).get_text()
+
+
+def _pdf_page_count(path: str) -> int:
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def _extract_pdf_range(path: str, start: int, stop: int) -> List[str]:
+    # Runs in a worker process; every worker opens the same file.
+    with fitz.open(path) as doc:
+        return list(iter_pdf_pages(doc, start, stop))
+
+
 def extract_text_from_pdf_bytes(b: bytes) -> str:
     try:
-        doc = fitz.open(stream=b, filetype="pdf")
-        return "\n".join(p.get_text() for p in doc).strip()
+        with fitz.open(stream=b, filetype="pdf") as doc:
+            return PAGE_SEPARATOR.join(iter_pdf_pages(doc)).strip()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF extraction error: {e}")
 
@@ -17,3 +48,123 @@ def extract_text_from_docx_bytes(b: bytes) -> str:
         return "\n".join(p.text for p in d.paragraphs).strip()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"DOCX extraction error: {e}")
+
+def extract_text_from_pdf_path(path: str) -> str:
+    try:
+        with fitz.open(path) as doc:
+            return PAGE_SEPARATOR.join(iter_pdf_pages(doc)).strip()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF extraction error: {e}")
+
+def extract_text_from_docx_path(path: str) -> str:
+    try:
+        d = docx.Document(path)
+        return "\n".join(p.text for p in d.paragraphs).strip()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DOCX extraction error: {e}")
+
+
+# Yields PDF pages in order without blocking the event loop. Documents with at
+# least parallel_min_pages pages are cut into ranges of range_pages that run
+# across a spawn process pool; smaller ones are read on a worker thread. Each
+# range must finish within page_timeout seconds per page or the request fails
+# with 504. A timed-out range cannot be cancelled once a worker has picked it
+# up, so the pool is terminated and recreated on the next parallel document;
+# other documents caught in that pool fail with 503 and can be retried.
+class PdfExtractor:
+    def __init__(
+        self,
+        workers: int = PDF_EXTRACT_WORKERS,
+        parallel_min_pages: int = PDF_PARALLEL_MIN_PAGES,
+        range_pages: int = PDF_RANGE_PAGES,
+        page_timeout: float = PDF_PAGE_TIMEOUT_SECONDS,
+    ):
+        self.workers = max(1, workers)
+        self.parallel_min_pages = parallel_min_pages
+        self.range_pages = max(1, range_pages)
+        self.page_timeout = page_timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.stats = {"documents": 0, "pages": 0, "parallel_documents": 0, "timeouts": 0, "errors": 0, "recycles": 0, "busy_seconds": 0.0}
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _recycle(self, pool: Optional[ProcessPoolExecutor]) -> None:
+        # Only the pool that timed out; a concurrent request may already have
+        # replaced it. ProcessPoolExecutor has no public way to stop a running
+        # task before Python 3.14, so its workers are terminated directly.
+        if pool is None or pool is not self._pool:
+            return
+        self._pool = None
+        for proc in list((getattr(pool, "_processes", None) or {}).values()):
+            proc.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        self.stats["recycles"] += 1
+
+    async def iter_pages(self, path: str) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        try:
+            pages = await asyncio.to_thread(_pdf_page_count, path)
+        except Exception as e:
+            self.stats["errors"] += 1
+            raise HTTPException(status_code=500, detail=f"PDF extraction error: {e}")
+        self.stats["documents"] += 1
+        pool = None
+        if pages >= self.parallel_min_pages and self.workers > 1:
+            self.stats["parallel_documents"] += 1
+            self.start()
+            pool = self._pool
+            loop = asyncio.get_running_loop()
+            submit = lambda a, b: loop.run_in_executor(pool, _extract_pdf_range, path, a, b)
+        else:
+            submit = lambda a, b: asyncio.to_thread(_extract_pdf_range, path, a, b)
+        ranges = [(a, min(a + self.range_pages, pages)) for a in range(0, pages, self.range_pages)]
+        futures = [asyncio.ensure_future(submit(a, b)) for a, b in ranges]
+        try:
+            for (a, b), fut in zip(ranges, futures):
+                # Ranges run concurrently, so each waits at most its own budget
+                # after the previous one has been yielded.
+                chunk = await asyncio.wait_for(fut, timeout=self.page_timeout * (b - a))
+                self.stats["pages"] += len(chunk)
+                for text in chunk:
+                    yield text
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            # Threads cannot be stopped; a stuck thread-path range finishes on its own.
+            self._recycle(pool)
+            raise HTTPException(status_code=504, detail="PDF extraction timed out")
+        except BrokenProcessPool:
+            self.stats["errors"] += 1
+            raise HTTPException(status_code=503, detail="PDF extraction was interrupted, please retry.", headers={"Retry-After": "2"})
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            raise HTTPException(status_code=500, detail=f"PDF extraction error: {e}")
+        finally:
+            for fut in futures:
+                fut.cancel()
+            self.stats["busy_seconds"] += time.perf_counter() - started
+
+    async def extract_text(self, path: str) -> str:
+        return PAGE_SEPARATOR.join([page async for page in self.iter_pages(path)]).strip()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "busy_seconds": round(self.stats["busy_seconds"], 3),
+            "workers": self.workers,
+            "parallel_min_pages": self.parallel_min_pages,
+        }
+
+
+pdf_extractor = PdfExtractor()
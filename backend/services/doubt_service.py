@@ -1,8 +1,9 @@
+from typing import AsyncIterator
 from fastapi import HTTPException
-from services.llm_client import flash_25
+from services.llm_client import generate_content, stream_content
 
-def get_answer_from_text(question_text: str) -> str:
-    prompt = f"""
+def build_answer_prompt(question_text: str) -> str:
+    return f"""
     You are a study assistant for students.
     The following question was extracted from an image:
 
@@ -10,8 +11,15 @@ def get_answer_from_text(question_text: str) -> str:
 
     Provide a clear, step-by-step, student-friendly answer.
     """
+
+async def get_answer_from_text(question_text: str) -> str:
     try:
-        resp = flash_25.generate_content(prompt)
+        resp = await generate_content(build_answer_prompt(question_text))
         return (resp.text or "No answer generated.").strip()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gemini error: {e}")
+
+def stream_answer(question_text: str) -> AsyncIterator[str]:
+    return stream_content(build_answer_prompt(question_text))
@@ -0,0 +1,97 @@
+import os
+import re
+import logging
+from typing import Any, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+EDUCHAT_CLASSIFIER_PATH = os.getenv("EDUCHAT_CLASSIFIER_PATH", "")
+EDUCHAT_CLASSIFIER_THRESHOLD = float(os.getenv("EDUCHAT_CLASSIFIER_THRESHOLD", "0.5"))
+
+EDU_KEYWORDS = {
+    "math","mathematics","algebra","geometry","calculus","trigonometry","probability","statistics",
+    "science","physics","chemistry","biology","geology","astronomy",
+    "english","grammar","vocabulary","literature","writing","essay","reading","comprehension",
+    "history","civics","geography","economics","political","social studies","socialstudies",
+    "computer","coding","programming","python","java","c++","algorithms","data structures",
+    "study","exam","test","homework","assignment","syllabus","curriculum","revision","notes"
+}
+
+
+def _trie_pattern(words) -> str:
+    # Alternation factored by shared prefixes ("a(?:lg(?:ebra|orithms)|...)"),
+    # so the regex engine tries one branch per leading character instead of
+    # every keyword at every position.
+    trie: Dict[str, Any] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        alts = [re.escape(ch) + build(sub) for ch, sub in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+EXPLICIT_TERMS = (
+    "18+", "16+", "nsfw", "porn", "sex", "sexual", "nude", "naked", "erotic", "fetish", "bdsm", "incest",
+    "rape", "bestiality", "onlyfans", "boobs", "penis", "vagina", "semen", "cum", "anal", "oral",
+    "blowjob", "handjob", "hookup", "escort",
+)
+
+# Both patterns run on the lowercased question. Keywords match as plain
+# substrings, like the old per-keyword `in` loop, so "mathematical" still
+# counts; explicit terms must be whole words.
+EDU_KEYWORDS_PATTERN = re.compile(_trie_pattern(EDU_KEYWORDS))
+EXPLICIT_PATTERNS = re.compile(r"\b(?:" + _trie_pattern(EXPLICIT_TERMS) + r")\b")
+
+
+# Decides whether an educhat question is in scope. Explicit content is always
+# refused. With a classifier loaded (a scikit-learn pipeline over raw text
+# exposing predict_proba, positive class = educational) it makes the call;
+# otherwise any keyword hit admits the question.
+class EduGate:
+    def __init__(self, threshold: float = EDUCHAT_CLASSIFIER_THRESHOLD):
+        self.threshold = threshold
+        self.classifier = None
+        self.stats = {"allowed": 0, "refused": 0, "explicit": 0, "classified": 0}
+
+    def load(self, path: str = EDUCHAT_CLASSIFIER_PATH) -> None:
+        if not path:
+            return
+        try:
+            from joblib import load
+            self.classifier = load(path)
+        except Exception as e:
+            log.warning("educhat classifier not loaded from %s: %s", path, e)
+
+    def score(self, question: str) -> Optional[float]:
+        if self.classifier is None:
+            return None
+        return float(self.classifier.predict_proba([question])[0][1])
+
+    def is_educational(self, question: str) -> bool:
+        t = question.lower()
+        if EXPLICIT_PATTERNS.search(t):
+            self.stats["explicit"] += 1
+            self.stats["refused"] += 1
+            return False
+        if self.classifier is not None:
+            self.stats["classified"] += 1
+            allowed = self.score(question) >= self.threshold
+        else:
+            allowed = EDU_KEYWORDS_PATTERN.search(t) is not None
+        self.stats["allowed" if allowed else "refused"] += 1
+        return allowed
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "classifier": self.classifier is not None, "threshold": self.threshold}
+
+
+edu_gate = EduGate()
@@ -0,0 +1,121 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+from filelock import FileLock
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBED_CACHE_BATCH_SIZE = int(os.getenv("EMBED_CACHE_BATCH_SIZE", "256"))
+_SQL_CHUNK = 500
+
+
+# Persistent embedding cache keyed by sha256(model, chunk text). Vectors are
+# appended to a float32 file read back through a NumPy memmap, and an SQLite
+# table maps each key to its row. Only cache misses reach the embedding API,
+# in batches of EMBED_CACHE_BATCH_SIZE.
+class CachedEmbeddings(Embeddings):
+    def __init__(self, inner: Embeddings, model_name: str, batch_size: int = EMBED_CACHE_BATCH_SIZE):
+        self.inner = inner
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.root: Optional[Path] = None
+        self._dim: Optional[int] = None
+        self._lock = threading.Lock()
+        # FileLock(thread_local=False) is re-entrant across threads, so it
+        # only serializes processes; this serializes threads in one worker.
+        self._append_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "api_batches": 0}
+
+    def open(self, root: Path) -> None:
+        root.mkdir(parents=True, exist_ok=True)
+        stem = re.sub(r"[^A-Za-z0-9_.-]", "_", self.model_name)
+        self._db_path = root / f"{stem}.sqlite"
+        self._vec_path = root / f"{stem}.f32"
+        self._file_lock = FileLock(str(root / f"{stem}.lock"), thread_local=False)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            found = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        self._dim = int(found[0]) if found else None
+        self.root = root
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self._db_path), timeout=30)
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, int]:
+        rows: Dict[str, int] = {}
+        with self._connect() as conn:
+            for i in range(0, len(keys), _SQL_CHUNK):
+                part = keys[i:i + _SQL_CHUNK]
+                marks = ",".join("?" * len(part))
+                rows.update(conn.execute(f"SELECT key, row FROM embeddings WHERE key IN ({marks})", part).fetchall())
+        return rows
+
+    def _append(self, keys: List[str], vectors: List[List[float]]) -> Dict[str, int]:
+        arr = np.asarray(vectors, dtype=np.float32)
+        with self._append_lock, self._file_lock, self._connect() as conn:
+            if self._dim is None:
+                found = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+                self._dim = int(found[0]) if found else arr.shape[1]
+                conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (str(self._dim),))
+            row_bytes = self._dim * 4
+            with open(self._vec_path, "ab") as f:
+                # A crash mid-write can leave a partial row at the end; drop it
+                # so new rows start on a row boundary.
+                start = f.seek(0, os.SEEK_END) // row_bytes
+                if f.tell() != start * row_bytes:
+                    f.truncate(start * row_bytes)
+                f.write(arr.tobytes())
+            rows = {k: start + i for i, k in enumerate(keys)}
+            conn.executemany("INSERT OR IGNORE INTO embeddings (key, row) VALUES (?, ?)", rows.items())
+        return rows
+
+    def _read(self, rows: List[int]) -> np.ndarray:
+        whole = self._vec_path.stat().st_size // (self._dim * 4)
+        mm = np.memmap(self._vec_path, dtype=np.float32, mode="r", shape=(whole, self._dim))
+        return np.array(mm[rows])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.root is None or not texts:
+            return self.inner.embed_documents(texts)
+        keys = [self._key(t) for t in texts]
+        rows = self._lookup(list(set(keys)))
+        missing: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in rows:
+                missing.setdefault(k, t)
+        with self._lock:
+            self.stats["hits"] += len(keys) - sum(1 for k in keys if k in missing)
+            self.stats["misses"] += len(missing)
+        miss_keys = list(missing)
+        for i in range(0, len(miss_keys), self.batch_size):
+            batch = miss_keys[i:i + self.batch_size]
+            vectors = self.inner.embed_documents([missing[k] for k in batch])
+            with self._lock:
+                self.stats["api_batches"] += 1
+            rows.update(self._append(batch, vectors))
+        return self._read([rows[k] for k in keys]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "model": self.model_name,
+                "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+text_embeddings = CachedEmbeddings(OpenAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL)
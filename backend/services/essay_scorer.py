@@ -0,0 +1,76 @@
+import os
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+ESSAY_BATCH_WINDOW_MS = float(os.getenv("ESSAY_BATCH_WINDOW_MS", "5"))
+ESSAY_BATCH_MAX = int(os.getenv("ESSAY_BATCH_MAX", "64"))
+
+
+# Collects essays submitted within a short window (or until max_batch is
+# reached) and scores them with one vectorized model.predict call on a worker
+# thread, so concurrent requests share the model cost and never block the
+# event loop.
+class EssayScorer:
+    def __init__(self, model, window_ms: float = ESSAY_BATCH_WINDOW_MS, max_batch: int = ESSAY_BATCH_MAX):
+        self.model = model
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {"essays": 0, "batches": 0, "max_batch_seen": 0}
+
+    async def score(self, essay: str) -> float:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((essay, fut))
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return await fut
+
+    async def score_many(self, essays: List[str]) -> List[float]:
+        scores = await asyncio.to_thread(self.model.predict, essays)
+        self._count(len(essays))
+        return [float(s) for s in scores]
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            scores = await self.score_many([essay for essay, _ in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # Score individually so one bad input does not fail its neighbours.
+                for item in batch:
+                    await self._run([item])
+                return
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), score in zip(batch, scores):
+            if not fut.done():
+                fut.set_result(score)
+
+    def _count(self, n: int) -> None:
+        self.stats["essays"] += n
+        self.stats["batches"] += 1
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], n)
+
+    def metrics(self) -> Dict[str, Any]:
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "avg_batch": round(self.stats["essays"] / batches, 2) if batches else 0.0,
+            "pending": len(self._pending),
+        }
@@ -1,10 +1,14 @@
 import os
+import asyncio
+from typing import AsyncIterator, Dict, List
 from dotenv import load_dotenv
 from joblib import load
 from fastapi import HTTPException
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from services.llm_client import ainvoke
+from services.essay_scorer import EssayScorer
 
 load_dotenv()
 
@@ -13,6 +17,7 @@ try:
     _essay_model = load("models/essay_grader.joblib")
 except Exception as e:
     raise RuntimeError(f"Failed to load essay_grader.joblib: {e}")
+essay_scorer = EssayScorer(_essay_model)
 
 _llm = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash",
@@ -32,14 +37,47 @@ _prompt = PromptTemplate(
 )
 _chain = _prompt | _llm | _parser
 
-def predict_score_and_explain(essay: str):
+ESSAY_EXPLAIN_CONCURRENCY = int(os.getenv("ESSAY_EXPLAIN_CONCURRENCY", "8"))
+
+async def _explain(essay: str, score: float) -> str:
     try:
-        score = float(_essay_model.predict([essay])[0])
+        return await ainvoke(_chain, {"essay": essay, "score": score}, provider="gemini")
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Model prediction error: {e}")
+        raise HTTPException(status_code=500, detail=f"LLM error: {e}")
+
+async def predict_score_and_explain(essay: str):
     try:
-        explanation = _chain.invoke({"essay": essay, "score": score})
+        score = await essay_scorer.score(essay)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"LLM error: {e}")
+        raise HTTPException(status_code=500, detail=f"Model prediction error: {e}")
+    explanation = await _explain(essay, score)
 
     return {"essay": essay, "predicted_score": score, "explanation": explanation}
+
+async def predict_scores(essays: List[str]) -> List[float]:
+    try:
+        return await essay_scorer.score_many(essays)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model prediction error: {e}")
+
+async def explain_many(essays: List[str], scores: List[float]) -> AsyncIterator[Dict]:
+    # Yields results in completion order; each carries its index in the batch.
+    sem = asyncio.Semaphore(ESSAY_EXPLAIN_CONCURRENCY)
+
+    async def one(i: int) -> Dict:
+        async with sem:
+            try:
+                explanation = await _explain(essays[i], scores[i])
+            except HTTPException as e:
+                return {"index": i, "predicted_score": scores[i], "error": e.detail}
+        return {"index": i, "predicted_score": scores[i], "explanation": explanation}
+
+    tasks = [asyncio.create_task(one(i)) for i in range(len(essays))]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
@@ -0,0 +1,111 @@
+import os
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+EXTRACT_CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+# Extracted text keyed by (kind, sha256 of the uploaded bytes), stored as one
+# file per entry under STORAGE_ROOT. Least recently used entries are deleted
+# once the total size passes max_bytes.
+class ExtractCache:
+    def __init__(self, max_bytes: int = EXTRACT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.root: Optional[Path] = None
+        self._index: "OrderedDict[Path, int]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def open(self, root: Path) -> None:
+        root.mkdir(parents=True, exist_ok=True)
+        files = sorted(
+            ((p, p.stat()) for p in root.glob("*/*/*.txt")),
+            key=lambda item: item[1].st_mtime,
+        )
+        with self._lock:
+            self.root = root
+            self._index.clear()
+            self._bytes = 0
+            for p, st in files:
+                self._index[p] = st.st_size
+                self._bytes += st.st_size
+            self._evict()
+
+    def _path(self, kind: str, digest: str) -> Path:
+        return self.root / kind / digest[:2] / f"{digest}.txt"
+
+    async def get(self, kind: str, digest: str) -> Optional[str]:
+        if self.root is None:
+            return None
+        return await asyncio.to_thread(self._get, kind, digest)
+
+    async def put(self, kind: str, digest: str, text: str) -> None:
+        if self.root is None:
+            return
+        await asyncio.to_thread(self._put, kind, digest, text)
+
+    def _get(self, kind: str, digest: str) -> Optional[str]:
+        path = self._path(kind, digest)
+        try:
+            text = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.stats["misses"] += 1
+                size = self._index.pop(path, None)
+                if size is not None:
+                    self._bytes -= size
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+            if path in self._index:
+                self._index.move_to_end(path)
+        return text
+
+    def _put(self, kind: str, digest: str, text: str) -> None:
+        path = self._path(kind, digest)
+        data = text.encode("utf-8")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            log.warning("extract cache write failed for %s: %s", path, e)
+            return
+        with self._lock:
+            self._bytes -= self._index.pop(path, 0)
+            self._index[path] = len(data)
+            self._bytes += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._index:
+            path, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self.stats["evictions"] += 1
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+extract_cache = ExtractCache()
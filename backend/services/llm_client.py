@@ -1,5 +1,9 @@
 import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
 from dotenv import load_dotenv
+from fastapi import HTTPException
 import google.generativeai as genai
 
 load_dotenv()
@@ -12,3 +16,103 @@ genai.configure(api_key=GOOGLE_API_KEY)
 # Provide both models if you want to vary by task
 flash_15 = genai.GenerativeModel("gemini-1.5-flash")
 flash_25 = genai.GenerativeModel("gemini-2.5-flash")
+
+# Every LLM call from a request handler goes through this module so one worker
+# can keep many calls in flight without blocking the event loop, while each
+# provider is capped at its own concurrency limit.
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+PROVIDER_LIMITS = {
+    "gemini": int(os.getenv("GEMINI_MAX_CONCURRENCY", "32")),
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "32")),
+}
+
+_semaphores = {p: asyncio.Semaphore(n) for p, n in PROVIDER_LIMITS.items()}
+_stats: Dict[str, Dict[str, int]] = {
+    p: {"in_flight": 0, "waiting": 0, "calls": 0, "timeouts": 0, "errors": 0} for p in PROVIDER_LIMITS
+}
+
+
+@asynccontextmanager
+async def _slot(provider: str):
+    stats = _stats[provider]
+    stats["waiting"] += 1
+    try:
+        await _semaphores[provider].acquire()
+    finally:
+        stats["waiting"] -= 1
+    stats["in_flight"] += 1
+    stats["calls"] += 1
+    try:
+        yield
+    except Exception:
+        stats["errors"] += 1
+        raise
+    finally:
+        stats["in_flight"] -= 1
+        _semaphores[provider].release()
+
+
+async def _limited(provider: str, make_call, timeout: Optional[float]):
+    async def run():
+        async with _slot(provider):
+            return await make_call()
+    try:
+        return await asyncio.wait_for(run(), timeout=timeout or LLM_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        _stats[provider]["timeouts"] += 1
+        raise HTTPException(status_code=504, detail=f"{provider} request timed out")
+
+
+async def generate_content(prompt: str, model=None, timeout: Optional[float] = None):
+    model = model or flash_25
+    return await _limited("gemini", lambda: model.generate_content_async(prompt), timeout)
+
+
+async def ainvoke(runnable, inputs: Any, provider: str = "gemini", timeout: Optional[float] = None):
+    return await _limited(provider, lambda: runnable.ainvoke(inputs), timeout)
+
+
+async def aembed_query(embeddings, text: str, timeout: Optional[float] = None):
+    return await _limited("openai", lambda: embeddings.aembed_query(text), timeout)
+
+
+async def _stream(provider: str, open_stream, timeout: Optional[float]) -> AsyncIterator[Any]:
+    # The timeout applies to the wait for each chunk, not the whole stream.
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+    async with _slot(provider):
+        try:
+            it = (await asyncio.wait_for(open_stream(), timeout=timeout)).__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(it.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except asyncio.TimeoutError:
+            _stats[provider]["timeouts"] += 1
+            raise HTTPException(status_code=504, detail=f"{provider} stream timed out")
+
+
+async def astream(runnable, inputs: Any, provider: str = "gemini", timeout: Optional[float] = None) -> AsyncIterator[Any]:
+    async def open_stream():
+        return runnable.astream(inputs)
+    async for chunk in _stream(provider, open_stream, timeout):
+        yield chunk
+
+
+async def stream_content(prompt: str, model=None, timeout: Optional[float] = None) -> AsyncIterator[str]:
+    model = model or flash_25
+    async def open_stream():
+        return await model.generate_content_async(prompt, stream=True)
+    async for chunk in _stream("gemini", open_stream, timeout):
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. only safety metadata).
+            continue
+        if text:
+            yield text
+
+
+def llm_metrics() -> Dict[str, Any]:
+    return {p: {**s, "limit": PROVIDER_LIMITS[p]} for p, s in _stats.items()}
@@ -1,19 +1,182 @@
+import os
+import asyncio
+import hashlib
+import logging
+from typing import AsyncIterator, List, Tuple
 from fastapi import HTTPException
-from services.llm_client import flash_25
+from services.llm_client import generate_content, stream_content
+from services.extract_cache import extract_cache
 
-def summarize_text(text: str) -> str:
-    prompt = f"""
+log = logging.getLogger(__name__)
+
+# Documents up to NOTES_SINGLE_PASS_TOKENS go to the model in one prompt.
+# Larger ones are split into NOTES_CHUNK_TOKENS chunks along page and
+# paragraph boundaries, each chunk is summarized (at most
+# NOTES_MAP_CONCURRENCY at a time, cached by chunk hash) and the partial
+# summaries are reduced into the final summary.
+NOTES_SINGLE_PASS_TOKENS = int(os.getenv("NOTES_SINGLE_PASS_TOKENS", "12000"))
+NOTES_CHUNK_TOKENS = int(os.getenv("NOTES_CHUNK_TOKENS", "6000"))
+NOTES_MAP_CONCURRENCY = int(os.getenv("NOTES_MAP_CONCURRENCY", "4"))
+NOTES_TOKEN_ENCODING = os.getenv("NOTES_TOKEN_ENCODING", "cl100k_base")
+# Bump when the chunk prompt changes so cached partial summaries are not reused.
+_CHUNK_PROMPT_VERSION = "1"
+_MAX_REDUCE_LEVELS = 3
+
+_encoding = None
+
+
+def load_encoding():
+    """Load the tokenizer; called at startup because tiktoken may download its BPE file."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(NOTES_TOKEN_ENCODING)
+        except Exception as e:
+            # Offline without a cached BPE file we fall back to an estimate.
+            log.warning("tiktoken unavailable, estimating token counts: %s", e)
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    enc = load_encoding()
+    return len(enc.encode(text, disallowed_special=())) if enc else len(text) // 4
+
+
+def _split_oversized(unit: str, max_tokens: int) -> List[str]:
+    enc = load_encoding()
+    if enc:
+        tokens = enc.encode(unit, disallowed_special=())
+        return [enc.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+    step = max_tokens * 4
+    return [unit[i:i + step] for i in range(0, len(unit), step)]
+
+
+def _units(text: str, max_tokens: int) -> List[Tuple[str, int]]:
+    # Pages (form-feed separated) that fit are kept whole; larger ones, and
+    # DOCX text which has no pages, are cut at line breaks (one per DOCX
+    # paragraph) and only a single over-long line falls back to token windows.
+    # Every piece is tokenized once.
+    units: List[Tuple[str, int]] = []
+    for page in text.split("\f"):
+        n = count_tokens(page)
+        if n <= max_tokens:
+            units.append((page, n))
+            continue
+        for line in page.split("\n"):
+            n = count_tokens(line)
+            if n <= max_tokens:
+                units.append((line, n))
+            else:
+                units.extend((piece, count_tokens(piece)) for piece in _split_oversized(line, max_tokens))
+    return [(u, n) for u, n in units if u.strip()]
+
+
+def plan_chunks(text: str, single_pass_tokens: int = NOTES_SINGLE_PASS_TOKENS, max_tokens: int = NOTES_CHUNK_TOKENS) -> List[str]:
+    """[text] when it fits in one prompt, else chunks of at most max_tokens packed greedily in order."""
+    units = _units(text, max_tokens)
+    if sum(n for _, n in units) <= single_pass_tokens:
+        return [text]
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for unit, n in units:
+        if current and size + n > max_tokens:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += n
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def build_summary_prompt(text: str) -> str:
+    return f"""
     You are an AI study assistant.
     Summarize the following educational content for a 10th-grade student.
     Use short sentences, bullet points, and highlight key concepts.
-    Generate summary based on the content size or length. 
+    Generate summary based on the content size or length.
     It should neither be too short nor be too long just like textbooks.
 
     Content:
     {text}
     """
+
+
+def build_chunk_prompt(text: str) -> str:
+    return f"""
+    You are an AI study assistant.
+    The following is one section of a longer educational document.
+    Write concise bullet-point notes that keep every key concept, definition,
+    formula, date and example from this section. Do not add an introduction.
+
+    Section:
+    {text}
+    """
+
+
+def build_reduce_prompt(partials: str) -> str:
+    return f"""
+    You are an AI study assistant.
+    The following are notes on consecutive sections of one educational document.
+    Combine them into a single summary of the whole document for a 10th-grade student.
+    Use short sentences, bullet points, and highlight key concepts.
+    Keep the document's order of topics and remove repetition.
+    It should neither be too short nor be too long just like textbooks.
+
+    Section notes:
+    {partials}
+    """
+
+
+async def _summarize_chunk(chunk: str, sem: asyncio.Semaphore) -> str:
+    digest = hashlib.sha256(f"{_CHUNK_PROMPT_VERSION}\0{chunk}".encode("utf-8")).hexdigest()
+    cached = await extract_cache.get("summary", digest)
+    if cached is not None:
+        return cached
+    async with sem:
+        resp = await generate_content(build_chunk_prompt(chunk))
+    partial = (resp.text or "").strip()
+    if partial:
+        await extract_cache.put("summary", digest, partial)
+    return partial
+
+
+async def _map_to_partials(chunks: List[str]) -> str:
+    """Summarize chunks until the combined notes fit in one prompt."""
+    sem = asyncio.Semaphore(NOTES_MAP_CONCURRENCY)
+    text = ""
+    for _ in range(_MAX_REDUCE_LEVELS):
+        partials = await asyncio.gather(*(_summarize_chunk(c, sem) for c in chunks))
+        text = "\n\n".join(p for p in partials if p)
+        chunks = await asyncio.to_thread(plan_chunks, text)
+        if len(chunks) == 1:
+            break
+    return text
+
+
+async def _reduce_prompt_for(text: str) -> str:
+    # Tokenizing a whole textbook takes a while; keep it off the event loop.
+    chunks = await asyncio.to_thread(plan_chunks, text)
+    if len(chunks) == 1:
+        return build_summary_prompt(text)
+    return build_reduce_prompt(await _map_to_partials(chunks))
+
+
+async def summarize_text(text: str) -> str:
     try:
-        resp = flash_25.generate_content(prompt)
+        resp = await generate_content(await _reduce_prompt_for(text))
         return (resp.text or "No summary generated.").strip()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gemini summarization error: {e}")
+
+
+async def stream_summary(text: str) -> AsyncIterator[str]:
+    # Chunk summaries are computed first; only the final pass is streamed.
+    prompt = await _reduce_prompt_for(text)
+    async for piece in stream_content(prompt):
+        yield piece
@@ -1,13 +1,128 @@
-from fastapi import UploadFile, HTTPException
-from PIL import Image
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from fastapi import HTTPException
+from PIL import Image, ImageOps
 import pytesseract
-import io
-
-async def extract_text_from_image(uploaded_file: UploadFile) -> str:
-    try:
-        data = await uploaded_file.read()
-        image = Image.open(io.BytesIO(data))
-        text = pytesseract.image_to_string(image)
-        return (text or "").strip()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"OCR error: {e}")
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", str(4 * OCR_WORKERS)))
+OCR_TIMEOUT_SECONDS = float(os.getenv("OCR_TIMEOUT_SECONDS", "60"))
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2400"))
+
+
+def _otsu_threshold(hist: List[int]) -> int:
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_bg = weight_bg = 0
+    best, best_var = 127, -1.0
+    for t in range(256):
+        weight_bg += hist[t]
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += t * hist[t]
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        var = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if var > best_var:
+            best, best_var = t, var
+    return best
+
+
+def preprocess(image: Image.Image) -> Image.Image:
+    image = ImageOps.exif_transpose(image)
+    gray = image.convert("L")
+    scale = 1.0
+    dpi = image.info.get("dpi")
+    if dpi and dpi[0] and dpi[0] > OCR_TARGET_DPI:
+        scale = OCR_TARGET_DPI / float(dpi[0])
+    longest = max(gray.size)
+    if longest * scale > OCR_MAX_SIDE:
+        scale = OCR_MAX_SIDE / longest
+    if scale < 1.0:
+        w, h = gray.size
+        gray = gray.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.LANCZOS)
+    threshold = _otsu_threshold(gray.histogram())
+    return gray.point([255 if p > threshold else 0 for p in range(256)]).convert("1")
+
+
+def _ocr_file(path: str) -> str:
+    with Image.open(path) as image:
+        # Tesseract is killed at the deadline so the worker is not held after
+        # the request has already given up.
+        return (pytesseract.image_to_string(preprocess(image), timeout=OCR_TIMEOUT_SECONDS) or "").strip()
+
+
+# Tesseract runs in a dedicated process pool so a large photo never blocks the
+# event loop. Requests beyond max_pending (running + queued) are rejected with
+# 503 instead of piling up behind the pool. A slot is released when the pool
+# task actually finishes, not when the request times out, so work still
+# running in a worker keeps counting.
+class OCREngine:
+    def __init__(self, workers: int = OCR_WORKERS, max_pending: int = OCR_MAX_PENDING):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self.stats = {"processed": 0, "rejected": 0, "timeouts": 0, "errors": 0, "busy_seconds": 0.0}
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def extract_text(self, path: str) -> str:
+        if self._pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise HTTPException(status_code=503, detail="OCR is busy, please retry shortly.", headers={"Retry-After": "2"})
+        self.start()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            task = self._pool.submit(_ocr_file, path)
+        except Exception as e:
+            self.stats["errors"] += 1
+            raise HTTPException(status_code=500, detail=f"OCR error: {e}")
+        self._pending += 1
+        task.add_done_callback(lambda _: loop.is_closed() or loop.call_soon_threadsafe(self._release))
+        try:
+            text = await asyncio.wait_for(asyncio.wrap_future(task), timeout=OCR_TIMEOUT_SECONDS)
+            self.stats["processed"] += 1
+            return text
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise HTTPException(status_code=504, detail="OCR timed out")
+        except Exception as e:
+            self.stats["errors"] += 1
+            raise HTTPException(status_code=500, detail=f"OCR error: {e}")
+        finally:
+            self.stats["busy_seconds"] += time.perf_counter() - started
+
+    def _release(self) -> None:
+        self._pending -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "busy_seconds": round(self.stats["busy_seconds"], 3),
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "workers": self.workers,
+        }
+
+
+ocr_engine = OCREngine()
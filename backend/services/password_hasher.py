@@ -0,0 +1,122 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from fastapi import HTTPException
+
+log = logging.getLogger(__name__)
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "256"))
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "250"))
+PASSWORD_HASH_CALIBRATE = os.getenv("PASSWORD_HASH_CALIBRATE", "1") == "1"
+PASSWORD_HASH_MIN_ROUNDS = os.getenv("PASSWORD_HASH_MIN_ROUNDS")
+# Floors used when PASSWORD_HASH_MIN_ROUNDS is unset, by passlib rounds_cost.
+_DEFAULT_MIN_ROUNDS = {"log2": 10, "linear": 1}
+
+
+# Runs passlib hash/verify calls on a dedicated thread pool so a login burst
+# never blocks the event loop. bcrypt and argon2 release the GIL while
+# hashing, so throughput scales with PASSWORD_HASH_WORKERS. Beyond
+# PASSWORD_HASH_MAX_PENDING queued calls new work is refused with 503.
+class PasswordHasher:
+    def __init__(self, context, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.context = context
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self.calibration: Dict[str, Any] = {}
+        self.stats = {"calls": 0, "rejected": 0, "max_queue_depth": 0, "wait_seconds": 0.0, "run_seconds": 0.0}
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwhash")
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise HTTPException(status_code=503, detail="Authentication is busy, please retry shortly.", headers={"Retry-After": "1"})
+        self.start()
+        self._pending += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self._pending - self._running)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, self._timed, time.perf_counter(), fn, args)
+        finally:
+            self._pending -= 1
+
+    def _timed(self, submitted: float, fn: Callable[..., Any], args: tuple) -> Any:
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.stats["calls"] += 1
+                self.stats["wait_seconds"] += started - submitted
+                self.stats["run_seconds"] += time.perf_counter() - started
+
+    def calibrate(self, target_ms: float = PASSWORD_HASH_TARGET_MS) -> Dict[str, Any]:
+        """Pick the default scheme's cost so one hash takes about target_ms here."""
+        handler = self.context.handler()
+        cost = getattr(handler, "rounds_cost", None)
+        if cost not in _DEFAULT_MIN_ROUNDS:
+            return {}
+        base = handler.default_rounds
+        try:
+            probe = handler.using(rounds=base)
+            elapsed = min(self._time_hash(probe) for _ in range(3))
+        except Exception as e:
+            log.warning("password hash calibration skipped: %s", e)
+            return {}
+        ratio = max(target_ms / 1000.0, 1e-3) / max(elapsed, 1e-6)
+        if cost == "log2":
+            rounds = base + math.floor(math.log2(ratio))
+        else:
+            rounds = math.floor(base * ratio)
+        floor = int(PASSWORD_HASH_MIN_ROUNDS) if PASSWORD_HASH_MIN_ROUNDS else _DEFAULT_MIN_ROUNDS[cost]
+        rounds = min(max(rounds, floor, handler.min_rounds), handler.max_rounds)
+        self.context.update(**{f"{handler.name}__default_rounds": rounds})
+        self.calibration = {
+            "scheme": handler.name,
+            "rounds": rounds,
+            "probe_rounds": base,
+            "probe_ms": round(elapsed * 1000, 2),
+            "target_ms": target_ms,
+        }
+        log.info("password hashing calibrated: %s", self.calibration)
+        return self.calibration
+
+    @staticmethod
+    def _time_hash(handler) -> float:
+        started = time.perf_counter()
+        handler.hash("calibration-probe")
+        return time.perf_counter() - started
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self.stats["calls"]
+            return {
+                **self.stats,
+                "wait_seconds": round(self.stats["wait_seconds"], 3),
+                "run_seconds": round(self.stats["run_seconds"], 3),
+                "avg_run_ms": round(self.stats["run_seconds"] * 1000 / calls, 2) if calls else 0.0,
+                "pending": self._pending,
+                "queue_depth": self._pending - self._running,
+                "running": self._running,
+                "workers": self.workers,
+                "calibration": self.calibration,
+            }
@@ -0,0 +1,127 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import faiss
+from services.embedding_cache import text_embeddings
+from services.llm_client import aembed_query
+
+log = logging.getLogger(__name__)
+
+EDUCHAT_CACHE_THRESHOLD = float(os.getenv("EDUCHAT_CACHE_THRESHOLD", "0.92"))
+EDUCHAT_CACHE_TTL_SECONDS = float(os.getenv("EDUCHAT_CACHE_TTL_SECONDS", str(24 * 3600)))
+EDUCHAT_CACHE_MAX_ENTRIES = int(os.getenv("EDUCHAT_CACHE_MAX_ENTRIES", "5000"))
+EDUCHAT_CACHE_MAX_BYTES = int(os.getenv("EDUCHAT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# A lookup is only worth a short wait; past this the question is a miss.
+EDUCHAT_CACHE_EMBED_TIMEOUT_SECONDS = float(os.getenv("EDUCHAT_CACHE_EMBED_TIMEOUT_SECONDS", "3"))
+
+
+# Near-duplicate question cache: questions are embedded, L2-normalized and
+# kept in a FAISS inner-product index, so a new question whose cosine
+# similarity to a stored one reaches `threshold` gets the stored answer.
+# Entries expire after `ttl_seconds`; beyond `max_entries`, or once vectors
+# plus question and answer text exceed `max_bytes`, the oldest go first.
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        embeddings,
+        threshold: float = EDUCHAT_CACHE_THRESHOLD,
+        ttl_seconds: float = EDUCHAT_CACHE_TTL_SECONDS,
+        max_entries: int = EDUCHAT_CACHE_MAX_ENTRIES,
+        max_bytes: int = EDUCHAT_CACHE_MAX_BYTES,
+        embed_timeout: float = EDUCHAT_CACHE_EMBED_TIMEOUT_SECONDS,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.embed_timeout = embed_timeout
+        self._index: Optional[faiss.IndexIDMap2] = None
+        self._entries: "OrderedDict[int, Tuple[str, str, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._next_id = 0
+        self.stats = {"hits": 0, "misses": 0, "expirations": 0, "evictions": 0, "errors": 0}
+
+    async def embed(self, question: str) -> Optional[np.ndarray]:
+        try:
+            raw = await aembed_query(self.embeddings, question, timeout=self.embed_timeout)
+            vec = np.asarray([raw], dtype=np.float32)
+        except Exception as e:
+            self.stats["errors"] += 1
+            log.warning("embedding question for answer cache failed: %s", e)
+            return None
+        faiss.normalize_L2(vec)
+        return vec
+
+    def lookup(self, vec: Optional[np.ndarray]) -> Optional[Tuple[str, float]]:
+        """Stored answer and similarity for the closest live question, if close enough."""
+        self._expire()
+        if vec is None or self._index is None or not self._entries:
+            self.stats["misses"] += 1
+            return None
+        scores, ids = self._index.search(vec, 1)
+        score, entry_id = float(scores[0][0]), int(ids[0][0])
+        entry = self._entries.get(entry_id)
+        if entry is None or score < self.threshold:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry[1], score
+
+    def put(self, vec: Optional[np.ndarray], question: str, answer: str) -> None:
+        if vec is None or not answer:
+            return
+        if self._index is None:
+            self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vec.shape[1]))
+        entry_id = self._next_id
+        self._next_id += 1
+        self._index.add_with_ids(vec, np.asarray([entry_id], dtype=np.int64))
+        size = vec.nbytes + len(question.encode("utf-8")) + len(answer.encode("utf-8"))
+        self._entries[entry_id] = (question, answer, time.monotonic(), size)
+        self._bytes += size
+        evict: List[int] = []
+        count, total = len(self._entries), self._bytes
+        for old_id, (_, _, _, old_size) in self._entries.items():
+            if count <= self.max_entries and total <= self.max_bytes or old_id == entry_id:
+                break
+            evict.append(old_id)
+            count -= 1
+            total -= old_size
+        if evict:
+            self._remove(evict)
+            self.stats["evictions"] += len(evict)
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        stale: List[int] = []
+        for entry_id, (_, _, created, _) in self._entries.items():
+            if created > cutoff:
+                break
+            stale.append(entry_id)
+        if stale:
+            self._remove(stale)
+            self.stats["expirations"] += len(stale)
+
+    def _remove(self, ids: List[int]) -> None:
+        for entry_id in ids:
+            entry = self._entries.pop(entry_id, None)
+            if entry is not None:
+                self._bytes -= entry[3]
+        if self._index is not None:
+            self._index.remove_ids(np.asarray(ids, dtype=np.int64))
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "threshold": self.threshold,
+        }
+
+
+educhat_answer_cache = SemanticAnswerCache(text_embeddings)
@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+# Collapses concurrent calls for the same key into one: the first caller
+# starts the work as a task, later callers await that same task. The key is
+# forgotten once the task finishes, so a failure is shared by everyone waiting
+# at that moment but the next call retries. Callers are shielded, so one
+# client disconnecting does not cancel the work for the others.
+class SingleFlight:
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.stats["calls"] += 1
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self.stats["shared"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "in_flight": len(self._tasks)}
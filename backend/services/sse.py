@@ -0,0 +1,86 @@
+import json
+import time
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+log = logging.getLogger(__name__)
+
+SSE_MEDIA_TYPE = "text/event-stream"
+_TTFB_SAMPLES = 512
+
+
+def wants_stream(request: Request) -> bool:
+    """Opt-in streaming: ?stream=1 or an Accept header asking for SSE."""
+    if request.query_params.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return SSE_MEDIA_TYPE in (request.headers.get("accept") or "")
+
+
+def _event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.stats = {"streams": 0, "completed": 0, "errors": 0, "disconnects": 0}
+        self.ttfb: Deque[float] = deque(maxlen=_TTFB_SAMPLES)
+
+    def metrics(self) -> Dict[str, Any]:
+        samples = sorted(self.ttfb)
+        def pct(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1) if samples else 0.0
+        return {**self.stats, "ttfb_ms_p50": pct(0.5), "ttfb_ms_p95": pct(0.95), "ttfb_ms_max": pct(1.0)}
+
+
+_endpoints: Dict[str, _EndpointStats] = {}
+
+
+# Streams text chunks as SSE "delta" events, then a single "done" event with
+# whatever on_complete returns for the full text. on_complete is where routes
+# write their activity log, so it runs once per completed stream. Failures
+# after the response has started are reported as an "error" event.
+def sse_response(
+    endpoint: str,
+    chunks: AsyncIterator[str],
+    on_complete: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+) -> StreamingResponse:
+    stats = _endpoints.setdefault(endpoint, _EndpointStats())
+    started = time.perf_counter()
+
+    async def gen():
+        stats.stats["streams"] += 1
+        parts = []
+        try:
+            async for text in chunks:
+                if not parts:
+                    stats.ttfb.append(time.perf_counter() - started)
+                parts.append(text)
+                yield _event("delta", {"text": text})
+            final = await on_complete("".join(parts).strip())
+        except HTTPException as e:
+            stats.stats["errors"] += 1
+            yield _event("error", {"status": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:
+            stats.stats["errors"] += 1
+            log.warning("%s stream failed: %s", endpoint, e)
+            yield _event("error", {"status": 500, "detail": str(e)})
+            return
+        except BaseException:
+            stats.stats["disconnects"] += 1
+            raise
+        stats.stats["completed"] += 1
+        yield _event("done", final or {})
+
+    return StreamingResponse(
+        gen(),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def sse_metrics() -> Dict[str, Any]:
+    return {name: s.metrics() for name, s in _endpoints.items()}
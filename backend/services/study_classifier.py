@@ -0,0 +1,103 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+YTCHAT_CLASSIFIER_PATH = os.getenv("YTCHAT_CLASSIFIER_PATH", "models/study_classifier.joblib")
+YTCHAT_CLASSIFIER_LOW = float(os.getenv("YTCHAT_CLASSIFIER_LOW", "0.2"))
+YTCHAT_CLASSIFIER_HIGH = float(os.getenv("YTCHAT_CLASSIFIER_HIGH", "0.8"))
+YTCHAT_CLASSIFIER_CHARS = int(os.getenv("YTCHAT_CLASSIFIER_CHARS", "20000"))
+_LATENCY_SAMPLES = 512
+
+
+# Decides whether a transcript is study material. A local scikit-learn
+# pipeline over raw text (e.g. TF-IDF + logistic regression, positive class =
+# study-related) settles confident cases on the CPU; only probabilities
+# strictly between `low` and `high`, or every case when no model is loaded,
+# go to the LLM fallback. Every LLM answer is stored with its transcript
+# snippet in the labels collection, which train_study_classifier.py reads to
+# build (and later rebuild) the local model.
+class StudyClassifier:
+    def __init__(self, low: float = YTCHAT_CLASSIFIER_LOW, high: float = YTCHAT_CLASSIFIER_HIGH):
+        self.low = low
+        self.high = high
+        self.model = None
+        self._labels = None
+        self.stats = {"local_yes": 0, "local_no": 0, "llm": 0, "llm_errors": 0, "labels_saved": 0, "errors": 0}
+        self._latency: Dict[str, Deque[float]] = {"local": deque(maxlen=_LATENCY_SAMPLES), "llm": deque(maxlen=_LATENCY_SAMPLES)}
+
+    def start(self, labels_col) -> None:
+        self._labels = labels_col
+
+    def load(self, path: str = YTCHAT_CLASSIFIER_PATH) -> None:
+        if not path or not os.path.exists(path):
+            return
+        try:
+            from joblib import load
+            self.model = load(path)
+        except Exception as e:
+            log.warning("study classifier not loaded from %s: %s", path, e)
+
+    def probability(self, text: str) -> Optional[float]:
+        if self.model is None:
+            return None
+        return float(self.model.predict_proba([text[:YTCHAT_CLASSIFIER_CHARS]])[0][1])
+
+    async def decide(self, text: str, fallback: Callable[[str], Awaitable[bool]]) -> bool:
+        started = time.perf_counter()
+        p = None
+        if self.model is not None:
+            try:
+                p = await asyncio.to_thread(self.probability, text)
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.warning("study classifier failed: %s", e)
+        if p is not None and (p >= self.high or p <= self.low):
+            self.stats["local_yes" if p >= self.high else "local_no"] += 1
+            self._latency["local"].append(time.perf_counter() - started)
+            return p >= self.high
+        self.stats["llm"] += 1
+        try:
+            label = await fallback(text)
+        except Exception as e:
+            # Unlabelled: treated as not study-related and not kept for training.
+            self.stats["llm_errors"] += 1
+            log.warning("study relatedness LLM call failed: %s", e)
+            return False
+        finally:
+            self._latency["llm"].append(time.perf_counter() - started)
+        await self._save_label(text, label, p)
+        return label
+
+    async def _save_label(self, text: str, label: bool, p: Optional[float]) -> None:
+        if self._labels is None:
+            return
+        try:
+            await self._labels.insert_one({
+                "text": text[:YTCHAT_CLASSIFIER_CHARS],
+                "label": int(label),
+                "probability": p,
+                "createdAt": datetime.now(timezone.utc),
+            })
+            self.stats["labels_saved"] += 1
+        except Exception as e:
+            log.warning("saving study classifier label failed: %s", e)
+
+    def metrics(self) -> Dict[str, Any]:
+        def pct(samples, q: float) -> float:
+            ordered = sorted(samples)
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2) if ordered else 0.0
+        latency = {
+            f"{path}_ms_{name}": pct(samples, q)
+            for path, samples in self._latency.items()
+            for name, q in (("p50", 0.5), ("p95", 0.95))
+        }
+        return {**self.stats, **latency, "model": self.model is not None, "low": self.low, "high": self.high}
+
+
+study_classifier = StudyClassifier()
@@ -0,0 +1,234 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from uuid import uuid4
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from pymongo.errors import DuplicateKeyError
+from services.llm_client import generate_content, stream_content
+
+log = logging.getLogger(__name__)
+
+PLAN_CLASSES = tuple(range(5, 11))
+PLAN_SUBJECTS = ("english", "maths", "science", "socialstudies", "coding")
+
+STUDY_PLAN_WARM = os.getenv("STUDY_PLAN_WARM", "1") != "0"
+STUDY_PLAN_VARIANTS = max(1, int(os.getenv("STUDY_PLAN_VARIANTS", "1")))
+STUDY_PLAN_REFRESH_SECONDS = float(os.getenv("STUDY_PLAN_REFRESH_SECONDS", str(7 * 24 * 3600)))
+STUDY_PLAN_WARM_CONCURRENCY = int(os.getenv("STUDY_PLAN_WARM_CONCURRENCY", "4"))
+STUDY_PLAN_LEASE_SECONDS = float(os.getenv("STUDY_PLAN_LEASE_SECONDS", "300"))
+STUDY_PLAN_RETRY_SECONDS = float(os.getenv("STUDY_PLAN_RETRY_SECONDS", "60"))
+STUDY_PLAN_RETRY_MAX_SECONDS = float(os.getenv("STUDY_PLAN_RETRY_MAX_SECONDS", str(6 * 3600)))
+_LEASE_ID = "_warm_lease"
+
+PlanKey = Tuple[int, str]
+
+
+def build_plan_prompt(class_std: int, subject: str) -> str:
+    return f"""
+Generate a 4-week study plan for a student in class {class_std} for the subject "{subject}".
+Constraints:
+- 6 days per week, 60–90 minutes per day.
+- Mix concept learning, worked examples, active recall, spaced revision, and weekly mini-tests.
+- Use simple language for the student's level.
+- Output format:
+Week 1:
+- Day 1: ...
+- Day 2: ...
+Week 2:
+Week 3:
+Week 4:
+Tailor the topics to class {class_std} {subject}.
+"""
+
+
+async def generate_plan(class_std: int, subject: str) -> str:
+    resp = await generate_content(build_plan_prompt(class_std, subject))
+    return (resp.text or "").strip()
+
+
+# Each (class_std, subject) key holds up to `variants` plans and a request gets
+# one at random. Plans are persisted in Mongo so restarts and other workers
+# reuse them; variants older than `refresh_seconds` are regenerated in the
+# background while the old text keeps being served. Only the worker holding
+# the warm lease (a document in the same collection) generates in the
+# background; the others pick its plans up on their next load. A variant that
+# fails to generate is retried with exponential backoff.
+class PlanStore:
+    def __init__(self, variants: int = STUDY_PLAN_VARIANTS, refresh_seconds: float = STUDY_PLAN_REFRESH_SECONDS):
+        self.variants = variants
+        self.refresh_seconds = refresh_seconds
+        self._plans: Dict[PlanKey, List[Optional[Dict[str, Any]]]] = {}
+        self._locks: Dict[PlanKey, asyncio.Lock] = {}
+        self._coll = None
+        self._task: Optional[asyncio.Task] = None
+        self._owner = uuid4().hex
+        self._retry: Dict[Tuple[PlanKey, int], Tuple[int, float]] = {}
+        self.stats = {"hits": 0, "misses": 0, "generated": 0, "failures": 0, "lease_denied": 0}
+
+    def start(self, coll, warm: bool = STUDY_PLAN_WARM) -> None:
+        self._coll = coll
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(warm), name="study-plan-store")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    async def get(self, class_std: int, subject: str) -> str:
+        key = (class_std, subject)
+        ready = [v for v in self._plans.get(key, []) if v]
+        if ready:
+            self.stats["hits"] += 1
+            return random.choice(ready)["plan"]
+        self.stats["misses"] += 1
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            ready = [v for v in self._plans.get(key, []) if v]
+            if ready:
+                return random.choice(ready)["plan"]
+            entry = await self._generate(key, 0)
+        return entry["plan"] if entry else ""
+
+    async def stream(self, class_std: int, subject: str) -> AsyncIterator[str]:
+        # Cached plans arrive as one chunk; on a miss the generation is
+        # streamed and the finished plan stored like any other.
+        key = (class_std, subject)
+        ready = [v for v in self._plans.get(key, []) if v]
+        if ready:
+            self.stats["hits"] += 1
+            yield random.choice(ready)["plan"]
+            return
+        self.stats["misses"] += 1
+        parts = []
+        async for piece in stream_content(build_plan_prompt(class_std, subject)):
+            parts.append(piece)
+            yield piece
+        plan = "".join(parts).strip()
+        if plan and not any(self._slot_list(key)):
+            await self._store(key, 0, plan)
+
+    async def _run(self, warm: bool) -> None:
+        await self._load()
+        if not warm:
+            return
+        while True:
+            await self._refresh_stale()
+            await asyncio.sleep(self._next_refresh_in())
+
+    async def _load(self) -> None:
+        if self._coll is None:
+            return
+        try:
+            async for doc in self._coll.find({"_id": {"$ne": _LEASE_ID}}):
+                variant = int(doc.get("variant", 0))
+                if variant >= self.variants or not doc.get("plan"):
+                    continue
+                slots = self._slot_list((int(doc["class_std"]), doc["subject"]))
+                stamp = float(doc.get("generatedAt", 0))
+                if slots[variant] is None or slots[variant]["generatedAt"] < stamp:
+                    slots[variant] = {"plan": doc["plan"], "generatedAt": stamp}
+        except Exception as e:
+            log.warning("loading study plan catalog failed: %s", e)
+
+    async def _acquire_lease(self) -> bool:
+        if self._coll is None:
+            return True
+        now = time.time()
+        try:
+            # Matches a lease that is ours or expired; otherwise the upsert
+            # collides with the live lease on _id.
+            await self._coll.update_one(
+                {"_id": _LEASE_ID, "$or": [{"owner": self._owner}, {"expiresAt": {"$lt": now}}]},
+                {"$set": {"owner": self._owner, "expiresAt": now + STUDY_PLAN_LEASE_SECONDS}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            self.stats["lease_denied"] += 1
+            return False
+        except Exception as e:
+            log.warning("acquiring study plan warm lease failed: %s", e)
+            return False
+
+    async def _refresh_stale(self) -> None:
+        # Another worker may already have refreshed some variants.
+        await self._load()
+        now = time.time()
+        stale = [
+            (key, i)
+            for key in ((c, s) for c in PLAN_CLASSES for s in PLAN_SUBJECTS)
+            for i, entry in enumerate(self._slot_list(key))
+            if (entry is None or now - entry["generatedAt"] >= self.refresh_seconds)
+            and self._retry.get((key, i), (0, 0.0))[1] <= now
+        ]
+        if not stale or not await self._acquire_lease():
+            return
+        sem = asyncio.Semaphore(STUDY_PLAN_WARM_CONCURRENCY)
+        async def one(key: PlanKey, variant: int):
+            async with sem:
+                # Renewed per plan so a long warm-up keeps the lease.
+                if not await self._acquire_lease():
+                    return
+                if await self._generate(key, variant):
+                    self._retry.pop((key, variant), None)
+                    return
+                attempts = self._retry.get((key, variant), (0, 0.0))[0] + 1
+                delay = min(STUDY_PLAN_RETRY_MAX_SECONDS, STUDY_PLAN_RETRY_SECONDS * 2 ** (attempts - 1))
+                self._retry[(key, variant)] = (attempts, time.time() + delay)
+        await asyncio.gather(*(one(k, i) for k, i in stale))
+
+    def _next_refresh_in(self) -> float:
+        entries = [e for slots in self._plans.values() for e in slots]
+        if not entries or None in entries:
+            return 60.0
+        stamps = [e["generatedAt"] for e in entries]
+        return max(60.0, min(stamps) + self.refresh_seconds - time.time())
+
+    def _slot_list(self, key: PlanKey) -> List[Optional[Dict[str, Any]]]:
+        return self._plans.setdefault(key, [None] * self.variants)
+
+    async def _generate(self, key: PlanKey, variant: int) -> Optional[Dict[str, Any]]:
+        class_std, subject = key
+        try:
+            plan = await generate_plan(class_std, subject)
+        except Exception as e:
+            self.stats["failures"] += 1
+            log.warning("study plan generation for class %s %s failed: %s", class_std, subject, e)
+            return None
+        if not plan:
+            self.stats["failures"] += 1
+            return None
+        return await self._store(key, variant, plan)
+
+    async def _store(self, key: PlanKey, variant: int, plan: str) -> Dict[str, Any]:
+        class_std, subject = key
+        entry = {"plan": plan, "generatedAt": time.time()}
+        self._slot_list(key)[variant] = entry
+        self.stats["generated"] += 1
+        if self._coll is not None:
+            try:
+                await self._coll.update_one(
+                    {"_id": f"{class_std}:{subject}:{variant}"},
+                    {"$set": {"class_std": class_std, "subject": subject, "variant": variant, **entry}},
+                    upsert=True,
+                )
+            except Exception as e:
+                log.warning("persisting study plan failed: %s", e)
+        return entry
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "keys": sum(1 for slots in self._plans.values() if any(slots)),
+            "variants": self.variants,
+            "backing_off": len(self._retry),
+        }
+
+
+plan_store = PlanStore()
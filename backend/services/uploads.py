@@ -0,0 +1,89 @@
+import os
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Dict, Tuple
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+MAX_IMAGE_UPLOAD_BYTES = int(os.getenv("MAX_IMAGE_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_DOC_UPLOAD_BYTES = int(os.getenv("MAX_DOC_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+# Allowance for multipart boundaries and part headers on top of the file itself.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+UPLOAD_LIMITS: Dict[str, int] = {
+    "/doubt/solve": MAX_IMAGE_UPLOAD_BYTES,
+    "/notes/summarize": MAX_DOC_UPLOAD_BYTES,
+}
+
+
+def _too_large(max_bytes: int) -> str:
+    return f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit."
+
+
+# Rejects oversized uploads from the Content-Length header before the
+# multipart body is read. Bodies without a length (chunked) are counted as
+# they arrive and fail with 413 as soon as they pass the limit, before
+# Starlette has spooled the whole file. Registered inside CORSMiddleware so
+# the 413 still carries CORS headers.
+class UploadLimitMiddleware:
+    def __init__(self, app, limits: Dict[str, int] = UPLOAD_LIMITS):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limit = next((v for suffix, v in self.limits.items() if scope["path"].endswith(suffix)), None)
+            if limit is not None:
+                budget = limit + MULTIPART_OVERHEAD_BYTES
+                length = dict(scope["headers"]).get(b"content-length", b"")
+                if length.isdigit() and int(length) > budget:
+                    response = JSONResponse(status_code=413, content={"detail": _too_large(limit)})
+                    await response(scope, receive, send)
+                    return
+                received = 0
+
+                async def limited_receive():
+                    nonlocal received
+                    message = await receive()
+                    if message["type"] == "http.request":
+                        received += len(message.get("body", b""))
+                        if received > budget:
+                            # FastAPI re-raises HTTPException from body parsing,
+                            # so this reaches the app's exception handler as a 413.
+                            raise HTTPException(status_code=413, detail=_too_large(limit))
+                    return message
+
+                await self.app(scope, limited_receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+def _write_chunk(f, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    f.write(chunk)
+
+
+async def save_upload(file: UploadFile, dest: Path, max_bytes: int) -> Tuple[int, str]:
+    declared = getattr(file, "size", None)
+    if declared is not None and declared > max_bytes:
+        raise HTTPException(status_code=413, detail=_too_large(max_bytes))
+    digest = hashlib.sha256()
+    size = 0
+    f = await asyncio.to_thread(open, dest, "wb")
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=_too_large(max_bytes))
+            await asyncio.to_thread(_write_chunk, f, digest, chunk)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        dest.unlink(missing_ok=True)
+        raise
+    await asyncio.to_thread(f.close)
+    return size, digest.hexdigest()
@@ -0,0 +1,88 @@
+import os
+import re
+import json
+import shutil
+import logging
+from pathlib import Path
+from typing import Optional
+import faiss
+from filelock import FileLock
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+log = logging.getLogger(__name__)
+
+YTCHAT_LOCK_TIMEOUT_SECONDS = float(os.getenv("YTCHAT_LOCK_TIMEOUT_SECONDS", "300"))
+
+_VIDEO_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+# One directory per video under STORAGE_ROOT/ytchat holding the FAISS index
+# and the chunk texts, so restarts and other workers reuse an already
+# embedded transcript. Indexes are memory-mapped read-only on load.
+class VideoIndexStore:
+    def __init__(self):
+        self.root: Optional[Path] = None
+
+    def open(self, root: Path) -> None:
+        root.mkdir(parents=True, exist_ok=True)
+        self.root = root
+
+    def _dir(self, video_id: str) -> Optional[Path]:
+        if self.root is None or not _VIDEO_ID.match(video_id):
+            return None
+        return self.root / video_id
+
+    def lock(self, video_id: str) -> Optional[FileLock]:
+        d = self._dir(video_id)
+        if d is None:
+            return None
+        return FileLock(str(d) + ".lock", timeout=YTCHAT_LOCK_TIMEOUT_SECONDS, thread_local=False)
+
+    def exists(self, video_id: str) -> bool:
+        d = self._dir(video_id)
+        return d is not None and (d / "index.faiss").exists()
+
+    def load(self, video_id: str, embeddings) -> Optional[FAISS]:
+        d = self._dir(video_id)
+        if d is None or not (d / "index.faiss").exists():
+            return None
+        try:
+            try:
+                index = faiss.read_index(str(d / "index.faiss"), _MMAP_FLAGS)
+            except RuntimeError:
+                index = faiss.read_index(str(d / "index.faiss"))
+            texts = json.loads((d / "chunks.json").read_text(encoding="utf-8"))
+        except (OSError, RuntimeError, ValueError) as e:
+            log.warning("stored index for %s is unreadable: %s", video_id, e)
+            return None
+        ids = [str(i) for i in range(len(texts))]
+        docstore = InMemoryDocstore({i: Document(page_content=t) for i, t in zip(ids, texts)})
+        return FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=dict(enumerate(ids)),
+        )
+
+    def save(self, video_id: str, vs: FAISS) -> None:
+        d = self._dir(video_id)
+        if d is None:
+            return
+        texts = [vs.docstore.search(vs.index_to_docstore_id[i]).page_content for i in range(vs.index.ntotal)]
+        tmp = d.with_name(f"{d.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        try:
+            faiss.write_index(vs.index, str(tmp / "index.faiss"))
+            (tmp / "chunks.json").write_text(json.dumps(texts), encoding="utf-8")
+            shutil.rmtree(d, ignore_errors=True)
+            os.replace(tmp, d)
+        except OSError as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            log.warning("persisting index for %s failed: %s", video_id, e)
+
+
+yt_index_store = VideoIndexStore()